@@ -1,15 +1,16 @@
 import discord
 from discord.ext import commands
-import openai
-import os
-from commands.bot_errors import BotErrors
+from commands.admission import send_status
+from commands.llm.prompts import render_prompt
+from commands.llm.streaming import stream_reply
+from commands.message_buffer import recent_messages
+from commands.openai_gateway import StreamInterrupted, get_gateway
 
 class Egg(commands.Cog):
     """Cog for handling egg-obsessed AI chat responses."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
     @commands.command()
     async def egg(self, ctx, *, message: str = None):
@@ -24,41 +25,26 @@ class Egg(commands.Cog):
             await ctx.send("🥚 This command can only be used in a server.")
             return
 
-        if not BotErrors.require_role("Vetted")(ctx):
-            return
-
         if message is None:
-            async for msg in ctx.channel.history(limit=2):
-                if msg.id != ctx.message.id:
-                    message = msg.content
-                    break
+            for record in await recent_messages(self.bot, ctx.channel, 1, before=ctx.message.id):
+                message = record.content
 
             if not message:
                 await ctx.send("🥚 Couldn't find a previous message to egg-splain.")
                 return
 
-        wait_message = await ctx.send("🥚 Warming up the nest...")
+        wait_message = await send_status(ctx, "🥚 Warming up the nest...")
 
         try:
-            prompt = (
-                f"You are an AI who is absolutely obsessed with eggs. "
-                f"Every response must contain at least one egg-related metaphor or pun. "
-                f"Try to interpret the user’s message through the lens of eggs, yolks, shells, nests, omelets, etc. "
-                f"You get especially excited if the user talks about eggs directly. "
-                f"Be whimsical, playful, and charming. Always try to bring the conversation back to eggs. "
-                f"If all else fails, compare their message to something involving eggs.\n\n"
-                f"User message: {message}"
-            )
-
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            reply = response.choices[0].message.content
-            await wait_message.delete()
-            await ctx.send(reply)
-
+            reply = await stream_reply(ctx.channel, get_gateway(self.bot).chat_stream(
+                render_prompt("egg", message=message),
+                command="egg", user_id=ctx.author.id, guild_id=ctx.guild.id
+            ), message=wait_message)
+            if not reply.strip():
+                await wait_message.edit(content="🥚 The egg came out empty. Please try again.")
+
+        except StreamInterrupted as e:
+            await ctx.send(f"⚠️ The egg cracked mid-sentence: {e}")
         except Exception as e:
             await wait_message.delete()
             await ctx.send(f"⚠️ An error occurred while cracking the egg: {e}")
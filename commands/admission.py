@@ -0,0 +1,241 @@
+import asyncio
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+import discord
+from discord.ext import commands
+
+# (max running at once, max waiting in line) per command; `max_concurrent` and
+# `max_queue` in a command's #bot-config entry override these
+DEFAULT_COMMAND_LIMITS = {
+    "catchup": (2, 6),
+    "guide": (2, 6),
+    "image": (2, 8),
+    "snapshot": (2, 8),
+    "talkto": (4, 10),
+    "dream": (6, 15),
+    "chat": (8, 20),
+    "egg": (8, 20),
+    "bugme": (4, 10),
+    "user_chat": (8, 30),
+}
+MAX_PER_GUILD = 25  # Running + queued commands per guild
+MAX_PER_USER = 2  # Running + queued commands per user
+
+
+class AdmissionRejected(Exception):
+    """Raised when a command is turned away because the bot is at capacity."""
+
+
+class CommandQueue:
+    """Bounded FIFO line in front of one command."""
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiters = deque()  # (future, on_position) pairs
+
+
+class AdmissionControl(commands.Cog):
+    """Bounds how much work the bot accepts before it starts.
+
+    Each heavy command has a limit on how many copies run at once and how
+    many may wait in line; guilds and users also have caps. Anything over
+    a limit is rejected right away with a clear message, and queued users
+    see their position in their single status message.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.queues = {}
+        self.guild_load = Counter()
+        self.user_load = Counter()
+        self.update_tasks = set()
+        self.latest_positions = {}  # waiter -> most recent position, so stale edits are skipped
+
+    def get_queue(self, command_name):
+        """Returns the queue for a command, refreshing its limits from #bot-config."""
+        max_concurrent, max_queue = DEFAULT_COMMAND_LIMITS[command_name]
+        config_manager = self.bot.get_cog("ConfigManager")
+        if config_manager:
+            configured = config_manager.get_command_setting(command_name, "max_concurrent")
+            if isinstance(configured, int) and configured > 0:
+                max_concurrent = configured
+            configured = config_manager.get_command_setting(command_name, "max_queue")
+            if isinstance(configured, int) and configured >= 0:
+                max_queue = configured
+
+        queue = self.queues.get(command_name)
+        if queue is None:
+            queue = self.queues[command_name] = CommandQueue(max_concurrent, max_queue)
+        else:
+            queue.max_concurrent, queue.max_queue = max_concurrent, max_queue
+        return queue
+
+    @asynccontextmanager
+    async def admit(self, command_name, user_id, guild_id=None, on_position=None):
+        """Holds a place for one run of `command_name`, waiting in line if needed.
+
+        Only commands listed in DEFAULT_COMMAND_LIMITS are admission-controlled.
+        Raises AdmissionRejected when the user, guild or command queue is full.
+        `on_position(n, is_current)` is awaited in the background whenever the
+        caller's place in line changes; `is_current()` is False once that update
+        is stale (superseded, or the caller was admitted).
+        """
+        if self.user_load[user_id] >= MAX_PER_USER:
+            raise AdmissionRejected(
+                f"You already have {MAX_PER_USER} requests in progress. Please wait for them to finish."
+            )
+        if guild_id is not None and self.guild_load[guild_id] >= MAX_PER_GUILD:
+            raise AdmissionRejected("This server has too many requests in progress right now. Please try again shortly.")
+
+        queue = self.get_queue(command_name)
+        if (queue.running >= queue.max_concurrent or queue.waiters) and len(queue.waiters) >= queue.max_queue:
+            raise AdmissionRejected(f"`{command_name}` is at capacity right now. Please try again in a minute.")
+
+        self.user_load[user_id] += 1
+        if guild_id is not None:
+            self.guild_load[guild_id] += 1
+        try:
+            await self._wait_turn(queue, on_position)
+            try:
+                yield
+            finally:
+                queue.running -= 1
+                self._dispatch(queue)
+        finally:
+            self.user_load[user_id] -= 1
+            if not self.user_load[user_id]:
+                del self.user_load[user_id]
+            if guild_id is not None:
+                self.guild_load[guild_id] -= 1
+                if not self.guild_load[guild_id]:
+                    del self.guild_load[guild_id]
+
+    async def invoke(self, ctx, invoke):
+        """Runs `invoke(ctx)` once admitted, or tells the user why it was turned away."""
+        command_name = ctx.command.qualified_name
+        if command_name not in DEFAULT_COMMAND_LIMITS:
+            await invoke(ctx)  # Lightweight commands skip admission entirely
+            return
+
+        async def show_position(position, is_current):
+            await send_status(ctx, f"⏳ `!{command_name}` is busy. You are **#{position}** in line...",
+                              from_queue=True, is_current=is_current)
+
+        try:
+            async with self.admit(command_name, ctx.author.id, getattr(ctx.guild, "id", None), show_position):
+                await invoke(ctx)
+        except AdmissionRejected as e:
+            await send_status(ctx, f"🚦 {e}")
+            return
+        finally:
+            # Commands that never took over the queue message shouldn't leave it behind
+            if getattr(ctx, "status_from_queue", False):
+                await clear_status(ctx)
+
+    async def _wait_turn(self, queue, on_position):
+        if queue.running < queue.max_concurrent and not queue.waiters:
+            queue.running += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.waiters.append((waiter, on_position))
+        self._notify(waiter, on_position, len(queue.waiters))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                queue.running -= 1  # Admitted just as we were cancelled
+                self._dispatch(queue)
+            else:
+                queue.waiters = deque(entry for entry in queue.waiters if entry[0] is not waiter)
+                self._notify_positions(queue)
+            raise
+        finally:
+            self.latest_positions.pop(waiter, None)
+
+    def _dispatch(self, queue):
+        admitted = False
+        while queue.waiters and queue.running < queue.max_concurrent:
+            waiter, _ = queue.waiters.popleft()
+            if waiter.done():
+                continue
+            queue.running += 1
+            waiter.set_result(True)
+            admitted = True
+        if admitted:
+            self._notify_positions(queue)
+
+    def _notify_positions(self, queue):
+        for position, (waiter, on_position) in enumerate(queue.waiters, start=1):
+            self._notify(waiter, on_position, position)
+
+    def _notify(self, waiter, on_position, position):
+        if on_position is None:
+            return
+        self.latest_positions[waiter] = position
+        task = asyncio.create_task(self._safe_update(waiter, on_position, position))
+        self.update_tasks.add(task)
+        task.add_done_callback(self.update_tasks.discard)
+
+    async def _safe_update(self, waiter, on_position, position):
+        def is_current():
+            # Admitted (or gone) means the command owns the status message now
+            return not waiter.done() and self.latest_positions.get(waiter) == position
+
+        if not is_current():
+            return
+        try:
+            await on_position(position, is_current)
+        except discord.HTTPException:
+            pass  # A missed position update isn't worth failing the command over
+
+
+def status_lock(ctx):
+    """Returns the lock that keeps an invocation's status updates in order."""
+    lock = getattr(ctx, "status_lock", None)
+    if lock is None:
+        lock = ctx.status_lock = asyncio.Lock()
+    return lock
+
+
+async def send_status(ctx, content, from_queue=False, is_current=None):
+    """Shows `content` in the invocation's single status message, creating it on first use.
+
+    Updates to one invocation's status run one at a time, so a queue update
+    still being sent can't race the command's own first status. `is_current`,
+    if given, is checked once it's this update's turn; a stale update is dropped
+    and returns None.
+    """
+    async with status_lock(ctx):
+        if is_current is not None and not is_current():
+            return None
+        message = getattr(ctx, "status_message", None)
+        ctx.status_from_queue = from_queue
+        if message is not None:
+            try:
+                await message.edit(content=content)
+                return message
+            except discord.NotFound:
+                pass  # Deleted by the command; post a fresh one
+        ctx.status_message = await ctx.send(content)
+        return ctx.status_message
+
+
+async def clear_status(ctx):
+    """Deletes the invocation's status message, if it still exists."""
+    async with status_lock(ctx):
+        message = getattr(ctx, "status_message", None)
+        ctx.status_message = None
+        ctx.status_from_queue = False
+    if message is not None:
+        try:
+            await message.delete()
+        except discord.HTTPException:
+            pass
+
+
+async def setup(bot):
+    await bot.add_cog(AdmissionControl(bot))
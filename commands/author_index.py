@@ -0,0 +1,196 @@
+from collections import Counter, OrderedDict
+
+from discord.ext import commands
+from commands.llm.style import Baseline, StyleProfile
+from commands.message_buffer import MAX_CONTENT_CHARS, MessageRecord
+
+SAMPLE_SIZE = 50  # Messages kept per author
+MAX_AUTHORS = 2000  # Authors kept across all guilds; the least recently active go first
+SEED_FACTOR = 4  # A sample is seeded from this many times SAMPLE_SIZE stored messages
+# "recent" keeps an author's newest messages; "diverse" spreads the sample across
+# channels by evicting from the channel that holds the most. `sample_mode` in
+# the talkto #bot-config entry overrides this.
+DEFAULT_SAMPLE_MODE = "diverse"
+SAMPLE_MODES = ("recent", "diverse")
+
+
+class AuthorSample:
+    """A bounded sample of one author's text messages, oldest first, and the style profile built from it."""
+
+    __slots__ = ("mode", "entries", "per_channel", "seeded_for", "profile")
+
+    def __init__(self, mode, baseline):
+        self.mode = mode
+        self.entries = []  # (channel ID, MessageRecord), oldest first
+        self.per_channel = Counter()
+        self.seeded_for = None  # The whitelist (frozenset of channel IDs) last filled from the message store
+        self.profile = StyleProfile(baseline)  # Always describes exactly `entries`
+
+    def add(self, channel_id, record):
+        """Adds a message and returns the record evicted to make room (possibly `record` itself), if any."""
+        if any(entry.id == record.id for _, entry in self.entries):
+            return None
+        out_of_order = self.entries and record.id < self.entries[-1][1].id
+        self.entries.append((channel_id, record))
+        if out_of_order:
+            self.entries.sort(key=lambda item: item[1].id)
+        self.per_channel[channel_id] += 1
+        self.profile.add(record.content)
+        return self.evict() if len(self.entries) > SAMPLE_SIZE else None
+
+    def evict(self):
+        if self.mode == "recent":
+            index = 0
+        else:
+            busiest = max(self.per_channel.values())
+            index = next(i for i, (channel_id, _) in enumerate(self.entries) if self.per_channel[channel_id] == busiest)
+        channel_id, record = self.entries.pop(index)
+        self.per_channel[channel_id] -= 1
+        if not self.per_channel[channel_id]:
+            del self.per_channel[channel_id]
+        self.profile.remove(record.content)
+        return record
+
+    def edit(self, message_id, content):
+        for _, record in self.entries:
+            if record.id == message_id:
+                self.profile.remove(record.content)
+                record.content = content
+                self.profile.add(content)
+                return
+
+    def discard(self, message_ids):
+        kept = []
+        for channel_id, record in self.entries:
+            if record.id in message_ids:
+                self.profile.remove(record.content)
+            else:
+                kept.append((channel_id, record))
+        if len(kept) != len(self.entries):
+            self.entries = kept
+            self.per_channel = Counter(channel_id for channel_id, _ in kept)
+
+    def clear(self):
+        """Empties the sample, taking its messages back out of the guild baseline."""
+        self.discard({record.id for _, record in self.entries})
+
+
+class AuthorIndex(commands.Cog):
+    """Keeps a bounded sample of each author's messages in `!talkto`'s whitelisted channels.
+
+    Samples are seeded from the message store the first time an author is
+    looked up and then kept current from message events, so collecting an
+    author's corpus is a single in-memory lookup. Each sample carries a style
+    profile updated with it, weighted against a per-guild baseline of every
+    sampled message.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.samples = OrderedDict()  # (guild ID, author ID) -> AuthorSample, least recently active first
+        self.locations = {}  # message ID -> (guild ID, author ID), for edits and deletes
+        self.baselines = {}  # guild ID -> Baseline over all of the guild's samples
+
+    def whitelist(self, guild_id):
+        config_manager = self.bot.get_cog("ConfigManager")
+        return config_manager.get_channel_whitelist(guild_id, "talkto") if config_manager else frozenset()
+
+    def sample_mode(self, guild_id):
+        config_manager = self.bot.get_cog("ConfigManager")
+        mode = config_manager.get_command_setting("talkto", "sample_mode", guild_id=guild_id) if config_manager else None
+        return mode if mode in SAMPLE_MODES else DEFAULT_SAMPLE_MODE
+
+    def sample_for(self, guild_id, author_id):
+        key = (guild_id, author_id)
+        sample = self.samples.get(key)
+        mode = self.sample_mode(guild_id)
+        if sample is None or sample.mode != mode:
+            if sample is not None:
+                self.forget(sample)
+            sample = self.samples[key] = AuthorSample(mode, self.baselines.setdefault(guild_id, Baseline()))
+        self.samples.move_to_end(key)
+        while len(self.samples) > MAX_AUTHORS:
+            _, evicted = self.samples.popitem(last=False)
+            self.forget(evicted)
+        return sample
+
+    def forget(self, sample):
+        for _, record in sample.entries:
+            self.locations.pop(record.id, None)
+        sample.clear()
+
+    def add(self, guild_id, channel_id, record):
+        self.locations[record.id] = (guild_id, record.author_id)
+        evicted = self.sample_for(guild_id, record.author_id).add(channel_id, record)
+        if evicted is not None:
+            self.locations.pop(evicted.id, None)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.guild and not message.author.bot and message.content.strip() \
+                and message.channel.id in self.whitelist(message.guild.id):
+            self.add(message.guild.id, message.channel.id, MessageRecord.from_message(message))
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        key = self.locations.get(payload.message_id)
+        sample = self.samples.get(key) if key else None
+        if sample is not None:
+            sample.edit(payload.message_id, payload.message.content[:MAX_CONTENT_CHARS])
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.discard({payload.message_id})
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        self.discard(payload.message_ids)
+
+    def discard(self, message_ids):
+        for message_id in message_ids:
+            key = self.locations.pop(message_id, None)
+            if key in self.samples:
+                self.samples[key].discard({message_id})
+
+    async def messages(self, guild, author_id):
+        """Returns the author's sampled messages in whitelisted channels, oldest first, or None if unavailable.
+
+        None means the message store doesn't cover the whitelisted channels yet;
+        callers should then read the channels themselves.
+        """
+        sample = self.sample_for(guild.id, author_id)
+        whitelist = self.whitelist(guild.id)
+        if sample.seeded_for != whitelist:
+            # First lookup, or the whitelist changed since: newly listed channels need seeding too
+            message_store = self.bot.get_cog("MessageStore")
+            stored = await message_store.author_history(author_id, sorted(whitelist), SAMPLE_SIZE * SEED_FACTOR) \
+                if message_store else None
+            if stored is None:
+                return None
+            sample = self.sample_for(guild.id, author_id)  # The mode may have changed while we waited
+            self.retain(sample, whitelist)
+            for channel_id, record in reversed(stored):
+                self.add(guild.id, channel_id, record)
+            sample.seeded_for = whitelist
+        return [record for channel_id, record in sample.entries if channel_id in whitelist]
+
+    def retain(self, sample, whitelist):
+        """Drops a sample's messages from channels no longer whitelisted."""
+        dropped = {record.id for channel_id, record in sample.entries if channel_id not in whitelist}
+        for message_id in dropped:
+            self.locations.pop(message_id, None)
+        sample.discard(dropped)
+
+    def profile(self, guild_id, author_id):
+        """Returns the author's style profile as prompt variables (see StyleProfile.describe), or None if not seeded.
+
+        Call after `messages`, which seeds the sample for the current whitelist.
+        """
+        sample = self.samples.get((guild_id, author_id))
+        if sample is None or sample.seeded_for != self.whitelist(guild_id):
+            return None
+        return sample.profile.describe()
+
+
+async def setup(bot):
+    await bot.add_cog(AuthorIndex(bot))
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+
+import discord
+from discord.ext import commands
+from commands.admission import send_status
+
+# Roles a member needs (all of them) to run each command in a server;
+# `required_roles` in a command's #bot-config entry overrides these.
+# Commands used in DMs aren't checked; DM chat uses the `user_chat` rule (see dm_access_for).
+DEFAULT_REQUIRED_ROLES = {
+    "catchup": ("Vetted",),
+    "chat": ("Vetted",),
+    "clear": ("Fun Police", "Vetted"),
+    "commands": ("Vetted",),
+    "draw": ("Vetted",),
+    "dream": ("Vetted",),
+    "egg": ("Vetted",),
+    "guide": ("Vetted",),
+    "image": ("Vetted",),
+    "snapshot": ("Vetted",),
+    "talkto": ("Vetted",),
+    "user_chat": ("Vetted",),  # DM chat: needed in at least one mutual server
+}
+QUIET_DENIALS = {"clear"}  # Commands that ignore unauthorized users instead of replying
+DM_ALLOWED_TTL = 300  # Seconds a user's DM access is trusted unless they're seen posting in a server
+DM_DENIED_TTL = 60  # Seconds before a refused (or unknown) user is looked up again
+
+
+def describe_roles(names):
+    quoted = [f"'{name}'" for name in names]
+    if len(quoted) == 1:
+        return f"the {quoted[0]} role"
+    return f"the {', '.join(quoted[:-1])} and {quoted[-1]} roles"
+
+
+class Authorization(commands.Cog):
+    """Decides who may run each command, in one place.
+
+    Role names are resolved to IDs once per guild, and a member is checked by
+    intersecting their role IDs with each required role's IDs. Decisions are
+    cached per member until their roles, the guild's roles or the guild's
+    config change. DM chat access is cached per user with an expiry, and is
+    rechecked early whenever the user posts in a server. Member events don't
+    arrive without the members intent, so messages are the only reliable
+    signal that someone's roles changed.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.role_ids = {}  # guild ID -> {role name: frozenset of role IDs}
+        self.decisions = {}  # guild ID -> (config version, {member ID: (role IDs, {command: allowed})})
+        self.dm_access = {}  # user ID -> (True / False / None if no mutual server, monotonic expiry)
+
+    def required_roles(self, guild_id, command_name):
+        roles = DEFAULT_REQUIRED_ROLES.get(command_name, ())
+        config_manager = self.bot.get_cog("ConfigManager")
+        if config_manager:
+            roles = config_manager.get_command_setting(command_name, "required_roles", roles, guild_id)
+        return roles
+
+    def resolve_roles(self, guild):
+        """Returns the guild's role IDs by name, building the map on first use."""
+        role_ids = self.role_ids.get(guild.id)
+        if role_ids is None:
+            by_name = {}
+            for role in guild.roles:
+                by_name.setdefault(role.name, set()).add(role.id)
+            role_ids = self.role_ids[guild.id] = {name: frozenset(ids) for name, ids in by_name.items()}
+        return role_ids
+
+    def missing_roles(self, member, command_name):
+        """Returns the names of the required roles `member` lacks for a command."""
+        guild_roles = self.resolve_roles(member.guild)
+        member_roles = {role.id for role in member.roles}
+        return [
+            name for name in self.required_roles(member.guild.id, command_name)
+            if member_roles.isdisjoint(guild_roles.get(name, ()))
+        ]
+
+    def is_allowed(self, member, command_name):
+        """Returns whether `member` may run a command in their guild."""
+        config_manager = self.bot.get_cog("ConfigManager")
+        version = config_manager.get_snapshot(member.guild.id).version if config_manager else 0
+        cached_version, members = self.decisions.get(member.guild.id, (None, None))
+        if cached_version != version:
+            members = {}
+            self.decisions[member.guild.id] = (version, members)
+
+        # Member events only arrive for some members without the members intent,
+        # so an entry is also dropped if the member's roles no longer match it
+        role_ids = frozenset(role.id for role in member.roles)
+        entry = members.get(member.id)
+        if entry is None or entry[0] != role_ids:
+            entry = members[member.id] = (role_ids, {})
+        if command_name not in entry[1]:
+            entry[1][command_name] = not self.missing_roles(member, command_name)
+        return entry[1][command_name]
+
+    async def invoke(self, ctx, invoke):
+        """Runs `invoke(ctx)` only if the author may use the command."""
+        command_name = ctx.command.qualified_name
+        if ctx.guild is None or self.is_allowed(ctx.author, command_name):
+            await invoke(ctx)
+            return
+        if command_name not in QUIET_DENIALS:
+            missing = self.missing_roles(ctx.author, command_name)
+            await send_status(ctx, f"⚠️ You must have {describe_roles(missing)} to use this command.")
+
+    async def dm_access_for(self, user):
+        """Returns whether `user` may chat in DMs: True, False, or None if they share no server with the bot.
+
+        Answers come from the cache while fresh. Otherwise cached members are
+        checked first, and only servers where the user isn't cached are asked
+        over the API, so a refusal costs those calls at most once per DM_DENIED_TTL.
+        """
+        now = time.monotonic()
+        cached = self.dm_access.get(user.id)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        members, unknown = [], []
+        for guild in self.bot.guilds:
+            member = guild.get_member(user.id)
+            (members if member else unknown).append(member or guild)
+        access = any(self.is_allowed(member, "user_chat") for member in members)
+        if not access and unknown:
+            members += await self.fetch_members(user, unknown)
+            access = any(self.is_allowed(member, "user_chat") for member in members)
+        if not members:
+            access = None
+
+        self.dm_access[user.id] = (access, now + (DM_ALLOWED_TTL if access else DM_DENIED_TTL))
+        return access
+
+    @staticmethod
+    async def fetch_members(user, guilds):
+        async def fetch(guild):
+            try:
+                return await guild.fetch_member(user.id)
+            except (discord.NotFound, discord.Forbidden):
+                return None  # Not in that server, or no permission to look
+            except Exception as e:
+                logging.exception(f"Error fetching member {user.id} in {guild.name}: {e}")
+                return None
+        return [member for member in await asyncio.gather(*(fetch(guild) for guild in guilds)) if member]
+
+    def forget_guild(self, guild):
+        self.role_ids.pop(guild.id, None)
+        self.decisions.pop(guild.id, None)
+        self.dm_access.clear()  # Any user's access may have depended on this server
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.forget_guild(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.forget_guild(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            self.forget_guild(after.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.forget_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.forget_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """Drops a cached DM access answer once the author's current roles disagree with it."""
+        cached = self.dm_access.get(message.author.id)
+        if cached is None or not isinstance(message.author, discord.Member):
+            return
+        if cached[0] is None or self.is_allowed(message.author, "user_chat") != cached[0]:
+            self.dm_access.pop(message.author.id, None)
+
+    def forget_member(self, member):
+        _, members = self.decisions.get(member.guild.id, (None, {}))
+        members.pop(member.id, None)
+        self.dm_access.pop(member.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.dm_access.pop(member.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            self.forget_member(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.forget_member(member)
+
+
+async def setup(bot):
+    await bot.add_cog(Authorization(bot))
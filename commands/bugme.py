@@ -1,80 +1,46 @@
 import discord
 from discord.ext import commands
 import asyncio
-import openai
-import os
+from commands.llm.prompts import render_prompt
+from commands.message_buffer import recent_messages
+from commands.openai_gateway import get_gateway
 
 class BugMe(commands.Cog):
     """Cog for reminding users of a message at specified intervals."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  # Initialize OpenAI client
         self.active_reminders = {}  # Tracks active reminders by user ID
         self.reminder_tasks = {}  # Tracks asyncio tasks for reminders
-        self.openai_semaphore = asyncio.Semaphore(5)  # Limit to 5 concurrent OpenAI API calls
 
-    async def call_openai(self, prompt):
-        """Call OpenAI API with rate limiting."""
-        async with self.openai_semaphore:
-            try:
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return response.choices[0].message.content.strip()
-            except Exception as e:
-                print(f"Error with OpenAI API: {e}")
-                return None
+    async def call_openai(self, messages, stage, ctx=None):
+        """Call OpenAI API; concurrency and model choice are managed by the gateway."""
+        try:
+            response = await get_gateway(self.bot).chat(
+                messages,
+                command="bugme",
+                stage=stage,
+                user_id=ctx.author.id if ctx else None,
+                guild_id=ctx.guild.id if ctx and ctx.guild else None
+            )
+            return response.strip()
+        except Exception as e:
+            print(f"Error with OpenAI API: {e}")
+            return None
 
-    async def synthesize_reminder(self, input_text, context=None):
+    async def synthesize_reminder(self, input_text, context=None, ctx=None):
         """Use OpenAI to synthesize a reminder sentence."""
-        prompt = (
-            f"You are an assistant that creates concise and actionable reminders based on user input.\n"
-            f"Input: {input_text}\n"
+        messages = render_prompt(
+            "bugme.synthesize",
+            input_text=input_text,
+            context_line=f"Context: {context}\n" if context else "",
         )
-        if context:
-            prompt += f"Context: {context}\n"
-
-        prompt += (
-            f"Examples:\n"
-            f"Input: 'remind me about the penguins'\n"
-            f"Context: 'I keep having problems with penguins breaking out of my walls and I need to stop them. I need to set some traps.'\n"
-            f"Reminder: 'Set traps to stop penguins from breaking out of your walls.'\n"
-            f"Input: 'remind me to do the dishes'\n"
-            f"Context: 'The sink is full of dirty dishes.'\n"
-            f"Reminder: 'Wash the dirty dishes in the sink.'\n"
-            f"Input: 'remind me to take a break'\n"
-            f"Reminder: 'Take a break and relax for a few minutes.'\n"
-            f"Input: {input_text}\n"
-            f"Reminder:"
-        )
-
-        return await self.call_openai(prompt)
+        return await self.call_openai(messages, "synthesize", ctx)
 
-    async def parse_reminder(self, input_text):
+    async def parse_reminder(self, input_text, ctx=None):
         """Use OpenAI to parse the reminder details from freeform input."""
-        prompt = (
-            f"Extract the reminder details from the following input:\n"
-            f"Input: {input_text}\n"
-            f"Output format: {{'message': '<reminder message>', 'interval': <interval in seconds>, 'duration': <duration in seconds>}}\n"
-            f"Example 1:\n"
-            f"Input: 'tell me to do the dishes every 30 seconds for 10 minutes'\n"
-            f"Output: {{'message': 'do the dishes', 'interval': 30, 'duration': 600}}\n"
-            f"Example 2:\n"
-            f"Input: 'remind me that I am awesome every 5 minutes for 1 hour'\n"
-            f"Output: {{'message': 'I am awesome', 'interval': 300, 'duration': 3600}}\n"
-            f"Example 3:\n"
-            f"Input: 'remind me about the thing above with penguins'\n"
-            f"Output: {{'message': 'the thing above with penguins', 'interval': 1800, 'duration': 7200}}\n"
-            f"Example 4:\n"
-            f"Input: 'remind me in an hour to feed the cat'\n"
-            f"Output: {{'message': 'feed the cat', 'interval': 3600, 'duration': 3600}}\n"
-            f"Input: {input_text}\n"
-            f"Output:"
-        )
-
-        result = await self.call_openai(prompt)
+        messages = render_prompt("bugme.parse", input_text=input_text)
+        result = await self.call_openai(messages, "parse", ctx)
         if result:
             try:
                 return eval(result)  # Use eval cautiously; ensure OpenAI output is sanitized
@@ -97,12 +63,11 @@ class BugMe(commands.Cog):
             if isinstance(ctx.channel, discord.DMChannel):
                 await ctx.send("⚠️ Please provide a reminder message when using this command in DMs.")
                 return
-            async for message in ctx.channel.history(limit=1):
-                reminder = message.content
-                break
+            for record in await recent_messages(self.bot, ctx.channel, 1, before=ctx.message.id):
+                reminder = record.content
 
         # Parse the reminder using OpenAI
-        parsed_reminder = await self.parse_reminder(reminder)
+        parsed_reminder = await self.parse_reminder(reminder, ctx=ctx)
         if not parsed_reminder:
             await ctx.send("⚠️ I couldn't understand your reminder. Please try again.")
             return
@@ -118,7 +83,7 @@ class BugMe(commands.Cog):
             duration = interval  # Default to 1 reminder (same as interval)
 
         # Synthesize the reminder
-        synthesized_reminder = await self.synthesize_reminder(message)
+        synthesized_reminder = await self.synthesize_reminder(message, ctx=ctx)
         if not synthesized_reminder:
             await ctx.send("⚠️ I couldn't generate a reminder. Please try again.")
             return
@@ -1,20 +1,93 @@
+import asyncio
 import discord
 from discord.ext import commands
-import openai
-import os
 import datetime
-from commands.bot_errors import BotErrors
+from commands.llm.context import pack, token_budget
+from commands.llm.prompts import render_prompt
+from commands.message_store import messages_since
+from commands.openai_gateway import get_gateway
 from commands.config_manager import ConfigManager  # Import the config manager
 
+MAX_MESSAGES = 200  # Newest messages read per channel
+# Channel histories read at once. Stored channels are read locally; the rest go
+# over REST, where each channel has its own rate-limit bucket, so this mainly
+# keeps a large whitelist well under Discord's global request budget.
+FETCH_CONCURRENCY = 4
+# Channels summarized at once. The gateway's scheduler still decides when each
+# call runs; this only bounds how many one `!catchup` has queued.
+SUMMARY_WORKERS = 3
+
+
+def split_into_chunks(text, max_length=2000):
+    """Splits text into Discord-sized messages, breaking at newlines where possible."""
+    chunks = []
+    while len(text) > max_length:
+        split_index = text[:max_length].rfind("\n")  # Try to break at the last newline
+        if split_index == -1:
+            split_index = max_length  # If no newline found, break at max length
+        chunks.append(text[:split_index])
+        text = text[split_index:].strip()
+    chunks.append(text)  # Append remaining part
+    return chunks
+
+
 class Catchup(commands.Cog):
     """Cog for summarizing recent events across selected channels."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    async def summarize(self, ctx, records, budget):
+        """Returns a summary of a channel's records, or None if there's nothing worth reporting."""
+        messages = [f"{record.author_name}: {record.content}" for record in records if not record.author_bot]
+        if not messages:
+            return None  # Skip empty channels
+
+        # History arrives newest first; keep the newest messages that fit the token budget
+        messages = pack(messages[::-1], budget, max_item_tokens=200)
+
+        # **Generate a concise, actionable summary**
+        response = await get_gateway(self.bot).chat(
+            render_prompt("catchup", messages_text="\n".join(messages)),
+            command="catchup", user_id=ctx.author.id, guild_id=ctx.guild.id)
+        refined_summary = response.strip()
+
+        # **Filter out non-engaging summaries**
+        return None if refined_summary.upper() == "IGNORE" else refined_summary
+
+    def start_pipeline(self, ctx, channels, since):
+        """Starts fetching and summarizing every channel concurrently.
+
+        Returns the pipeline's tasks and a queue that receives
+        (channel, summary or None, exception or None) for each channel as soon
+        as it finishes. The caller must cancel the tasks when done.
+        """
+        budget = token_budget(self.bot, "catchup", ctx.guild.id)
+        fetch_slots = asyncio.Semaphore(FETCH_CONCURRENCY)
+        fetched = asyncio.Queue()
+        results = asyncio.Queue()
+
+        async def fetch(channel):
+            try:
+                async with fetch_slots:
+                    records = await messages_since(self.bot, channel, since, MAX_MESSAGES)
+                await fetched.put((channel, records))
+            except Exception as e:
+                await results.put((channel, None, e))
+
+        async def summarize_worker():
+            while True:
+                channel, records = await fetched.get()
+                try:
+                    await results.put((channel, await self.summarize(ctx, records, budget), None))
+                except Exception as e:
+                    await results.put((channel, None, e))
+
+        tasks = [asyncio.create_task(fetch(channel)) for channel in channels]
+        tasks += [asyncio.create_task(summarize_worker()) for _ in range(min(SUMMARY_WORKERS, len(channels)))]
+        return tasks, results
 
     @commands.command()
-    @BotErrors.require_role("Vetted")  # Restrict to users with "Vetted" role
     async def catchup(self, ctx):
         """
         Usage: `!catchup`
@@ -41,7 +114,7 @@ class Catchup(commands.Cog):
         header_message = f"""
 📢 **Command Executed: `!catchup`**
 📅 **Date:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-📝 **Fetching recent discussions... Please wait.**
+📝 **Fetching recent discussions... Summaries will arrive as each channel is ready.**
         """
         try:
             await ctx.author.send(header_message)
@@ -56,74 +129,34 @@ class Catchup(commands.Cog):
             return
 
         # Fetch allowed channels from config_manager
-        allowed_channels = await config_manager.get_command_whitelist("catchup")
+        allowed_channels = config_manager.get_whitelisted_channels(ctx.guild, "catchup")
 
         # Set message threshold (last 24 hours)
         time_threshold = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
 
-        # Collect summaries per channel
-        overall_summaries = []
-        for channel_name in allowed_channels:
-            channel = discord.utils.get(ctx.guild.text_channels, name=channel_name)
-            if not channel:
-                continue  # Skip if the channel doesn't exist
-
-            try:
-                messages = []
-                async for message in channel.history(after=time_threshold, limit=200):
-                    if not message.author.bot:
-                        messages.append(f"{message.author.display_name}: {message.content}")
-
-                if not messages:
-                    continue  # Skip empty channels
-
-                # **Generate a concise, actionable summary**
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": 
-                            "Summarize the following Discord messages into at most **three sentences**. "
-                            "Ignore trivial or unimportant discussions. "
-                            "Ignore single-message exchanges unless they spark a broader discussion. "
-                            "Ignore solo updates unless they received responses or engagement. "
-                            "Only include conversations that require engagement, support, or meaningful discussion."},
-                        {"role": "user", "content": "\n".join(messages)}
-                    ]
-                )
-                refined_summary = response.choices[0].message.content.strip()
-
-                # **Filter out non-engaging summaries**
-                if refined_summary.upper() == "IGNORE":
-                    continue  # Skip this channel
-
-                # **Store summary without sending immediately**
-                summary_text = f"📢 **Summary for `#{channel.name}`:**\n{refined_summary}"
-                overall_summaries.append(summary_text)
-
-            except discord.Forbidden:
-                continue  
-            except Exception as e:
-                await ctx.author.send(f"❌ Error summarizing `#{channel_name}`: {e}")
-
-        # **Send summaries only once at the end**
-        if overall_summaries:
-            final_summary = "\n\n".join(overall_summaries)
-
-            # **Split long messages into chunks before sending**
-            def split_into_chunks(text, max_length=2000):
-                chunks = []
-                while len(text) > max_length:
-                    split_index = text[:max_length].rfind("\n")  # Try to break at the last newline
-                    if split_index == -1:
-                        split_index = max_length  # If no newline found, break at max length
-                    chunks.append(text[:split_index])
-                    text = text[split_index:].strip()
-                chunks.append(text)  # Append remaining part
-                return chunks
-
-            for chunk in split_into_chunks(final_summary):
-                await ctx.author.send(chunk)  # Send each chunk separately
-        else:
+        # Channels are fetched and summarized concurrently; each summary is sent as soon as it's ready
+        tasks, results = self.start_pipeline(ctx, allowed_channels, time_threshold.timestamp())
+        sent = 0
+        try:
+            for _ in allowed_channels:
+                channel, summary, error = await results.get()
+                if isinstance(error, discord.Forbidden):
+                    continue
+                if error is not None:
+                    await ctx.author.send(f"❌ Error summarizing `#{channel.name}`: {error}")
+                    continue
+                if summary is None:
+                    continue  # Nothing worth reporting
+
+                # **Split long messages into chunks before sending**
+                for chunk in split_into_chunks(f"📢 **Summary for `#{channel.name}`:**\n{summary}"):
+                    await ctx.author.send(chunk)  # Send each chunk separately
+                sent += 1
+        finally:
+            for task in tasks:
+                task.cancel()  # Also stops the pipeline if the command is cancelled
+
+        if not sent:
             await ctx.author.send("✅ **`!catchup` complete. No significant discussions found.**")
 
         # **Final confirmation message**
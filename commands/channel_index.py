@@ -0,0 +1,173 @@
+import discord
+from discord.ext import commands
+
+
+def channel_position(channel):
+    """Sort key that keeps threads next to their parent channel."""
+    parent = getattr(channel, "parent", None)
+    if parent is not None:
+        return (parent.position, 1, channel.id)
+    return (getattr(channel, "position", 0), 0, channel.id)
+
+
+class GuildChannels:
+    """Text channels and threads of one guild, indexed by ID; text channels are also indexed by name.
+
+    Threads are left out of the name index so a whitelist entry like "general"
+    means the channel, not every thread that happens to share its name.
+    """
+
+    __slots__ = ("by_id", "by_name", "names")
+
+    def __init__(self):
+        self.by_id = {}  # channel ID -> channel
+        self.by_name = {}  # name -> [text channel IDs]; names aren't unique in Discord
+        self.names = {}  # text channel ID -> name it is indexed under (the channel object may already be renamed)
+
+    @classmethod
+    def of(cls, guild):
+        """Indexes a guild's cached text channels and threads."""
+        index = cls()
+        for channel in guild.text_channels:
+            index.add(channel)
+        for thread in guild.threads:
+            index.add(thread)
+        return index
+
+    def add(self, channel):
+        self.discard(channel.id)
+        self.by_id[channel.id] = channel
+        if isinstance(channel, discord.Thread):
+            return
+        self.names[channel.id] = channel.name
+        self.by_name.setdefault(channel.name, []).append(channel.id)
+
+    def discard(self, channel_id):
+        self.by_id.pop(channel_id, None)
+        name = self.names.pop(channel_id, None)
+        if name is None:
+            return
+        ids = self.by_name[name]
+        ids.remove(channel_id)
+        if not ids:
+            del self.by_name[name]
+
+    def find(self, name):
+        ids = self.by_name.get(name)
+        return self.by_id[ids[0]] if ids else None
+
+    def resolve(self, names):
+        """Returns the IDs of every channel named in `names`, and the names not found."""
+        ids, missing = set(), []
+        for name in names:
+            if name in self.by_name:
+                ids.update(self.by_name[name])
+            else:
+                missing.append(name)
+        return frozenset(ids), missing
+
+
+class ChannelIndex(commands.Cog):
+    """Keeps every guild's text channels and threads indexed by ID, and its text channels by name.
+
+    The index is built when the bot is ready and kept current from channel and
+    thread events, so lookups by name or ID never scan a guild's channel list.
+    After each change it dispatches `channel_index_update(guild)` so cogs that
+    compile channel names (like ConfigManager) can rebuild.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.guilds = {}  # guild ID -> GuildChannels
+
+    def build(self, guild):
+        index = self.guilds[guild.id] = GuildChannels.of(guild)
+        return index
+
+    def changed(self, guild):
+        self.bot.dispatch("channel_index_update", guild)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        for guild in self.bot.guilds:
+            self.build(guild)
+            self.changed(guild)
+        print(f"[ChannelIndex] Indexed {sum(len(index.by_id) for index in self.guilds.values())} channels "
+              f"in {len(self.guilds)} servers.")
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.build(guild)
+        self.changed(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.guilds.pop(guild.id, None)
+
+    def add(self, channel):
+        if not isinstance(channel, (discord.TextChannel, discord.Thread)):
+            return  # Only text channels and threads are indexed
+        index = self.guilds.get(channel.guild.id) or self.build(channel.guild)
+        index.add(channel)
+        self.changed(channel.guild)
+
+    def remove(self, guild, channel_id):
+        index = self.guilds.get(guild.id)
+        if index and channel_id in index.by_id:
+            index.discard(channel_id)
+            self.changed(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.add(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        if before.name != after.name:
+            self.add(after)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.remove(channel.guild, channel.id)
+
+    @commands.Cog.listener()
+    async def on_thread_create(self, thread):
+        self.add(thread)
+
+    @commands.Cog.listener()
+    async def on_thread_update(self, before, after):
+        if before.name != after.name:
+            self.add(after)
+
+    @commands.Cog.listener()
+    async def on_raw_thread_delete(self, payload):
+        guild = self.bot.get_guild(payload.guild_id)
+        if guild:
+            self.remove(guild, payload.thread_id)
+
+    def get(self, guild_id, channel_id):
+        """Returns a guild's text channel or thread by ID, or None."""
+        index = self.guilds.get(guild_id)
+        return index.by_id.get(channel_id) if index else None
+
+    def find(self, guild_id, name):
+        """Returns the first text channel in a guild with this name, or None."""
+        index = self.guilds.get(guild_id)
+        return index.find(name) if index else None
+
+    def resolve(self, guild_id, names):
+        """Returns the IDs of every text channel in a guild whose name is in `names`, and the names not found."""
+        index = self.guilds.get(guild_id)
+        return index.resolve(names) if index else (frozenset(), list(names))
+
+    def channels(self, guild_id, channel_ids):
+        """Returns the channels for `channel_ids` that still exist, in channel-list order."""
+        index = self.guilds.get(guild_id)
+        if index is None:
+            return []
+        found = [index.by_id[channel_id] for channel_id in channel_ids if channel_id in index.by_id]
+        return sorted(found, key=channel_position)
+
+
+async def setup(bot):
+    await bot.add_cog(ChannelIndex(bot))
@@ -1,15 +1,14 @@
 import discord
 from discord.ext import commands
-import openai
-import os
-from commands.bot_errors import BotErrors  # Import the error handler
+from commands.admission import send_status
+from commands.llm.streaming import stream_reply
+from commands.openai_gateway import StreamInterrupted, get_gateway
 
 class Chat(commands.Cog):
     """Cog for handling AI chat commands within a server."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  # Initialize OpenAI client
 
     @commands.command()
     async def chat(self, ctx, *, message: str):
@@ -25,24 +24,20 @@ class Chat(commands.Cog):
             await ctx.send("⚠️ This command can only be used in a server.")
             return
 
-        # Verify the user has the "Vetted" role
-        if not BotErrors.require_role("Vetted")(ctx):
-            return
-
         # Send "Please wait..." message
-        wait_message = await ctx.send("⏳ Processing... Please wait.")
+        wait_message = await send_status(ctx, "⏳ Processing... Please wait.")
 
         try:
-            # Generate AI response
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": message}]
-            )
-
-            reply = response.choices[0].message.content
-            await wait_message.delete()  # Remove "Please wait..." message
-            await ctx.send(reply)  # Post response in the server channel
-
+            # Stream the AI response into the "Please wait..." message as it is generated
+            reply = await stream_reply(ctx.channel, get_gateway(self.bot).chat_stream(
+                [{"role": "user", "content": message}],
+                command="chat", user_id=ctx.author.id, guild_id=ctx.guild.id
+            ), message=wait_message)
+            if not reply.strip():
+                await wait_message.edit(content="⚠️ I didn't get a response. Please try again.")
+
+        except StreamInterrupted as e:
+            await ctx.send(f"⚠️ The response was cut off: {e}")
         except Exception as e:
             await wait_message.delete()
             await ctx.send(f"⚠️ An error occurred: {e}")
@@ -1,4 +1,3 @@
-import discord
 from discord.ext import commands
 import asyncio
 import os
@@ -24,13 +23,6 @@ class ClearMessages(commands.Cog):
         if not ctx.guild:
             return  # No error message; command is silently ignored in DMs
 
-        # Enforce role restrictions
-        fun_police_role = discord.utils.get(ctx.author.roles, name="Fun Police")
-        vetted_role = discord.utils.get(ctx.author.roles, name="Vetted")
-
-        if not fun_police_role or not vetted_role:
-            return  # No error message; silently ignore unauthorized users
-
         # Limit the number of messages that can be cleared
         limit = min(limit, 100)
 
@@ -1,6 +1,5 @@
 import discord
 from discord.ext import commands
-from commands.bot_errors import BotErrors  # Import error handling
 from commands.config_manager import ConfigManager  # Import config manager for future integration
 
 class CommandsHelp(commands.Cog):
@@ -10,7 +9,6 @@ class CommandsHelp(commands.Cog):
         self.bot = bot
 
     @commands.command(name="commands")
-    @BotErrors.require_role("Vetted")  # Restrict to users with "Vetted" role
     async def list_commands(self, ctx, command_name: str = None):
         """Displays a list of available commands, or detailed help for a specific command.
 
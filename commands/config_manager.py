@@ -1,121 +1,323 @@
 import discord
 import json
+import os
 import re
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
 from discord.ext import commands
+from commands.channel_index import GuildChannels
+
+CONFIG_CHANNEL_NAME = "bot-config"
+
+# Guild whose config applies where there is no guild (DMs, bot-wide limits).
+# Defaults to the first guild found with a #bot-config.
+HOME_GUILD_ID = int(os.getenv("CONFIG_HOME_GUILD_ID", "0")) or None
+
+
+def is_number(minimum, allow_equal=True):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return value >= minimum if allow_equal else value > minimum
+    return check
+
+
+def is_int(minimum, allow_equal=True):
+    number = is_number(minimum, allow_equal)
+    return lambda value: isinstance(value, int) and number(value)
+
+
+def is_str_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def is_str_map(value):
+    return isinstance(value, dict) and all(isinstance(item, str) for item in value.values())
+
+
+# Every setting a command entry may contain: key -> (description, validator)
+SETTINGS_SCHEMA = {
+    "processing_whitelist": ("a list of channel names", is_str_list),
+    "deadline_seconds": ("a number above 0", is_number(0, allow_equal=False)),
+    "max_concurrent": ("an integer above 0", is_int(0, allow_equal=False)),
+    "max_queue": ("an integer of 0 or more", is_int(0)),
+    "cache": ("true or false", lambda value: isinstance(value, bool)),
+    "cache_ttl_seconds": ("a number of 0 or more", is_number(0)),
+    "model_tier": ("a tier name", lambda value: isinstance(value, str)),
+    "model_tiers": ("an object of stage → tier name", is_str_map),
+    "fallback_latency_seconds": ("a number above 0", is_number(0, allow_equal=False)),
+    "context_tokens": ("an integer above 0", is_int(0, allow_equal=False)),
+    "user_hourly_budget_usd": ("a number of 0 or more", is_number(0)),
+    "user_daily_budget_usd": ("a number of 0 or more", is_number(0)),
+    "required_roles": ("a list of role names", is_str_list),
+    "sample_mode": ('"recent" or "diverse"', lambda value: value in ("recent", "diverse")),
+}
+
+
+def freeze(value):
+    """Recursively turns dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def validate_config(raw_config):
+    """Checks a parsed #bot-config JSON against SETTINGS_SCHEMA.
+
+    Returns the config with invalid entries and settings dropped, plus a list
+    of human-readable problems. Unknown settings are kept but reported.
+    """
+    if not isinstance(raw_config, dict):
+        return None, ["The config must be a JSON object of command names."]
+
+    config, problems = {}, []
+    for command_name, settings in raw_config.items():
+        if not isinstance(settings, dict):
+            problems.append(f"`{command_name}` must be an object of settings.")
+            continue
+        config[command_name] = {}
+        for key, value in settings.items():
+            rule = SETTINGS_SCHEMA.get(key)
+            if rule is None:
+                problems.append(f"`{command_name}.{key}` is not a known setting.")
+            elif not rule[1](value):
+                problems.append(f"`{command_name}.{key}` must be {rule[0]}; ignored.")
+                continue
+            config[command_name][key] = value
+    return config, problems
+
+
+class ConfigSnapshot:
+    """One immutable, versioned, compiled view of a guild's #bot-config JSON.
+
+    Channel whitelists are compiled from names into frozensets of channel IDs
+    when the snapshot is built, so whitelist checks are set lookups. A new
+    snapshot replaces the old one whenever the config message or the guild's
+    channels change, so a caller holding a snapshot always sees a consistent
+    config.
+    """
+
+    __slots__ = ("version", "message_id", "loaded_at", "commands", "whitelists")
+
+    def __init__(self, version, message_id, commands_config, guild=None, resolve=None):
+        self.version = version
+        self.message_id = message_id
+        self.loaded_at = time.time()
+        self.commands = freeze(commands_config)
+        self.whitelists = MappingProxyType(self.compile_whitelists(guild, resolve))
+
+    def compile_whitelists(self, guild, resolve):
+        """`resolve(names)` returns the matching channel IDs and the names it couldn't find."""
+        if guild is None:
+            return {}
+        whitelists = {}
+        for command_name, settings in self.commands.items():
+            ids, missing = resolve(settings.get("processing_whitelist", ()))
+            if missing:
+                print(f"[ConfigManager] {guild.name}: `{command_name}` whitelists unknown channels {missing}.")
+            whitelists[command_name] = ids
+        return whitelists
+
+    def recompiled(self, guild, resolve):
+        """Returns a copy with whitelists rebuilt against the guild's current channels."""
+        return ConfigSnapshot(self.version, self.message_id, self.commands, guild, resolve)
+
+    def get(self, command_name, key, default=None):
+        entry = self.commands.get(command_name)
+        return entry.get(key, default) if isinstance(entry, Mapping) else default
+
+
+EMPTY_SNAPSHOT = ConfigSnapshot(0, None, {})
+
 
 class ConfigManager(commands.Cog):
+    """Keeps each guild's #bot-config JSON in memory and up to date.
+
+    Every guild has its own #bot-config and its own snapshot. The config is
+    read once at startup and then refreshed only when the config message is
+    posted, edited or deleted, so lookups never make a Discord request.
+    """
+
     def __init__(self, bot):
         self.bot = bot
-        self.config_channel_id = None  # Will be set dynamically
-        self.command_config = {}  # In-memory config storage
+        self.config_channels = {}  # guild ID -> #bot-config channel ID
+        self.snapshots = {}  # guild ID -> ConfigSnapshot
+        self.home_guild_id = HOME_GUILD_ID
 
     @commands.Cog.listener()
     async def on_ready(self):
-        """Finds #bot-config dynamically and prepares for polling on demand."""
-        await self.find_config_channel()
-
-    async def find_config_channel(self):
-        """Searches for #bot-config across all guilds."""
+        """Finds every guild's #bot-config and loads its current configuration."""
         await self.bot.wait_until_ready()
         for guild in self.bot.guilds:
-            for channel in guild.text_channels:
-                if channel.name == "bot-config":
-                    self.config_channel_id = channel.id
-                    print(f"[ConfigManager] Found #bot-config in {guild.name} (ID: {channel.id})")
-                    return
-        
-        print("[ConfigManager] Could not find #bot-config in any server.")
-
-    async def fetch_latest_config(self):
-        """Fetches the most recent config message from #bot-config and updates the in-memory configuration."""
-        if not self.config_channel_id:
-            print("[ConfigManager] No valid config channel found. Skipping config load.")
+            await self.load_guild(guild)
+        if not self.config_channels:
+            print(f"[ConfigManager] Could not find #{CONFIG_CHANNEL_NAME} in any server.")
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        await self.load_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.config_channels.pop(guild.id, None)
+        self.snapshots.pop(guild.id, None)
+
+    async def load_guild(self, guild):
+        """Finds a guild's #bot-config and loads the latest config message from it."""
+        channel = self.channel_lookup(guild).find(CONFIG_CHANNEL_NAME)
+        if not channel:
             return
+        self.config_channels[guild.id] = channel.id
+        if self.home_guild_id is None:
+            self.home_guild_id = guild.id
+        print(f"[ConfigManager] Found #{CONFIG_CHANNEL_NAME} in {guild.name} (ID: {channel.id})")
+        await self.fetch_latest_config(guild)
 
-        channel = self.bot.get_channel(self.config_channel_id)
+    async def fetch_latest_config(self, guild):
+        """Fetches the most recent config message from a guild's #bot-config and updates its snapshot."""
+        channel = guild.get_channel(self.config_channels.get(guild.id))
         if not channel:
-            print("[ConfigManager] Could not retrieve #bot-config channel by ID.")
+            print(f"[ConfigManager] Could not retrieve #{CONFIG_CHANNEL_NAME} in {guild.name}.")
             return
 
         async for message in channel.history(limit=1):
-            content = message.content.strip()
-
-            # If the content is wrapped in triple backticks, remove them
-            if content.startswith("```json") and content.endswith("```"):
-                content = content[7:-3].strip()  # Remove ```json (7 chars) and ``` (3 chars)
-            elif content.startswith("```") and content.endswith("```"):
-                content = content[3:-3].strip()  # Remove ``` and ```
-                
-            print(f"[ConfigManager] Processed JSON content:\n{repr(content)}")  # Debugging log
-            
-            # DEBUGGING: Log the raw message content
-            print(f"[ConfigManager] Raw message content: {repr(content)}")
-
-            if not content:
-                print("[ConfigManager] Retrieved an empty message from #bot-config.")
+            await self.load_config_message(message)
+
+    async def load_config_message(self, message):
+        """Parses a #bot-config message and, if it is valid, publishes it as the guild's new snapshot."""
+        content = message.content.strip()
+
+        # If the content is wrapped in triple backticks, remove them
+        if content.startswith("```json") and content.endswith("```"):
+            content = content[7:-3].strip()  # Remove ```json (7 chars) and ``` (3 chars)
+        elif content.startswith("```") and content.endswith("```"):
+            content = content[3:-3].strip()  # Remove ``` and ```
+
+        if not content:
+            print("[ConfigManager] Retrieved an empty message from #bot-config.")
+            return
+
+        fixed_content = None
+        try:
+            raw_config = json.loads(content)
+        except json.JSONDecodeError:
+            print("[ConfigManager] Invalid JSON detected. Attempting to correct format...")
+            fixed_content = self.fix_json_format(content)
+            if not fixed_content:
+                print("[ConfigManager] Could not generate a corrected JSON format; keeping the previous config.")
+                await self.react(message, "❌")
                 return
+            raw_config = json.loads(fixed_content)
+
+        config, problems = validate_config(raw_config)
+        for problem in problems:
+            print(f"[ConfigManager] {message.guild.name}: {problem}")
+        if config is None:
+            await self.react(message, "❌")
+            return
 
+        self.publish(message.guild, config, message.id)
+        await self.react(message, "⚠️" if problems else "✅")
+
+        # Edit the original message to update with fixed JSON
+        if fixed_content and message.author == self.bot.user:
             try:
-                new_config = json.loads(content)  # Try parsing first
-                self.command_config = new_config  # Replace existing config
-                print("[ConfigManager] Configuration updated successfully.")
-                
-                # 🔍 DEBUG: Check if "guide" is found in the parsed JSON
-                if "guide" in new_config:
-                    print("[ConfigManager] 'guide' section found in JSON!")
-                else:
-                    print("[ConfigManager] WARNING: 'guide' section NOT found in JSON!")
-
-            except json.JSONDecodeError:
-                print("[ConfigManager] Invalid JSON detected. Attempting to correct format...")
-
-                # Attempt to fix JSON formatting
-                fixed_content = self.fix_json_format(content)
-                if fixed_content:
-                    try:
-                        corrected_config = json.loads(fixed_content)  # Verify corrected JSON
-                        self.command_config = corrected_config  # Apply the corrected config
-                        print("[ConfigManager] JSON format corrected and configuration updated.")
-
-                        # Edit the original message to update with fixed JSON
-                        await message.edit(content=f"```json\n{fixed_content}\n```")
-                        print("[ConfigManager] Updated #bot-config with corrected JSON.")
-
-                    except json.JSONDecodeError:
-                        print("[ConfigManager] Automatic correction failed. Manual review needed.")
-                else:
-                    print("[ConfigManager] Could not generate a corrected JSON format.")
+                await message.edit(content=f"```json\n{fixed_content}\n```")
+                print("[ConfigManager] Updated #bot-config with corrected JSON.")
+            except discord.HTTPException as e:
+                print(f"[ConfigManager] Could not rewrite #bot-config: {e}")
+
+    async def react(self, message, emoji):
+        """Marks a config message as loaded (✅), loaded with problems (⚠️) or rejected (❌)."""
+        try:
+            for reaction in message.reactions:
+                if reaction.me and str(reaction.emoji) != emoji:
+                    await message.remove_reaction(reaction.emoji, self.bot.user)
+            await message.add_reaction(emoji)
+        except discord.HTTPException:
+            pass  # Cosmetic only
+
+    def publish(self, guild, config, message_id):
+        """Swaps in a new compiled snapshot for `guild`."""
+        previous = self.snapshots.get(guild.id, EMPTY_SNAPSHOT)
+        snapshot = ConfigSnapshot(previous.version + 1, message_id, config, guild, self.channel_lookup(guild).resolve)
+        self.snapshots[guild.id] = snapshot
+        print(f"[ConfigManager] {guild.name}: loaded config v{snapshot.version} ({len(config)} commands).")
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """A new message in a #bot-config becomes that guild's active config."""
+        if message.guild and message.channel.id == self.config_channels.get(message.guild.id):
+            await self.load_config_message(message)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        """Reloads when an active config message is edited (raw, so uncached messages count too)."""
+        snapshot = self.snapshots.get(payload.guild_id)
+        if snapshot and payload.message_id == snapshot.message_id:
+            await self.load_config_message(payload.message)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        """Falls back to the previous message when an active config message is deleted."""
+        snapshot = self.snapshots.get(payload.guild_id)
+        if snapshot and payload.message_id == snapshot.message_id:
+            guild = self.bot.get_guild(payload.guild_id)
+            if guild:
+                await self.fetch_latest_config(guild)
+
+    @commands.Cog.listener()
+    async def on_channel_index_update(self, guild):
+        """Rebuilds a guild's channel-ID whitelists after its channels are created, renamed or deleted."""
+        snapshot = self.snapshots.get(guild.id)
+        if snapshot:
+            self.snapshots[guild.id] = snapshot.recompiled(guild, self.channel_lookup(guild).resolve)
+
+    def channel_lookup(self, guild):
+        """Returns the guild's entry in the shared channel index (commands/channel_index.py)."""
+        channel_index = self.bot.get_cog("ChannelIndex")
+        index = channel_index.guilds.get(guild.id) if channel_index else None
+        return index or GuildChannels.of(guild)
 
     def fix_json_format(self, raw_json):
         """Attempts to fix common JSON formatting issues."""
         try:
-            # Remove non-printable characters (invisible Discord artifacts)
-            raw_json = re.sub(r'[^\x20-\x7E\n\t]', '', raw_json)
-
-            # Fix smart quotes and apostrophes
+            # Fix smart quotes and apostrophes (before stripping, which would delete them)
             raw_json = raw_json.replace("“", "\"").replace("”", "\"")
             raw_json = raw_json.replace("’", "'").replace("‘", "'")
 
+            # Remove non-printable characters (invisible Discord artifacts)
+            raw_json = re.sub(r'[^\x20-\x7E\n\t]', '', raw_json)
+
             # Attempt parsing again
             parsed_json = json.loads(raw_json)
         except json.JSONDecodeError:
             return None  # If still broken, return failure
-        
+
         return json.dumps(parsed_json, indent=4)  # Return properly formatted JSON
 
-    async def get_command_whitelist(self, command_name):
-        """Retrieves the latest configuration before returning the whitelist for a command."""
-        await self.fetch_latest_config()  # Polls #bot-config for the latest data
-        
-        # 🔍 DEBUG: Log available commands
-        print(f"[ConfigManager] Available commands in config: {list(self.command_config.keys())}")
-        
-        if command_name in self.command_config:
-            print(f"[ConfigManager] Found whitelist for '{command_name}': {self.command_config[command_name].get('processing_whitelist', [])}")
-        else:
-            print(f"[ConfigManager] WARNING: No entry found for command '{command_name}' in config!")
-
-        return self.command_config.get(command_name, {}).get("processing_whitelist", [])
+    def get_snapshot(self, guild_id=None):
+        """Returns a guild's snapshot; with no guild (DMs), the home guild's."""
+        return self.snapshots.get(guild_id if guild_id is not None else self.home_guild_id, EMPTY_SNAPSHOT)
+
+    def get_channel_whitelist(self, guild_id, command_name):
+        """Returns the IDs of the channels a command may read in a guild."""
+        return self.get_snapshot(guild_id).whitelists.get(command_name, frozenset())
+
+    def get_whitelisted_channels(self, guild, command_name):
+        """Returns the channels a command may read in a guild, in channel-list order."""
+        channel_index = self.bot.get_cog("ChannelIndex")
+        whitelist = self.get_channel_whitelist(guild.id, command_name)
+        if channel_index:
+            return channel_index.channels(guild.id, whitelist)
+        return [channel for channel in guild.text_channels if channel.id in whitelist]
+
+    def get_command_setting(self, command_name, key, default=None, guild_id=None):
+        """Returns a single setting for a command from the in-memory config."""
+        return self.get_snapshot(guild_id).get(command_name, key, default)
 
 async def setup(bot):
     await bot.add_cog(ConfigManager(bot))
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import discord
+from discord.ext import commands
+
+DEFAULT_DEADLINE = 60  # Seconds, for any command without its own entry
+
+# Built-in deadlines; `deadline_seconds` in a command's #bot-config entry overrides these
+DEFAULT_DEADLINES = {
+    "catchup": 180,
+    "guide": 120,
+    "snapshot": 120,
+    "image": 90,
+    "talkto": 90,
+    "dream": 60,
+    "chat": 60,
+    "egg": 60,
+    "bugme": 45,
+    "user_chat": 60,
+}
+
+
+class CommandDeadlines(commands.Cog):
+    """Enforces an end-to-end deadline on every command invocation.
+
+    The deadline covers everything the command does (history fetches, LLM
+    calls and sends). When it passes, the command's task is cancelled, which
+    unwinds any scheduler slot or connection it holds, and the user is told.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def get_deadline(self, command_name, guild_id=None):
+        """Returns the deadline for a command in seconds, preferring the guild's #bot-config."""
+        config_manager = self.bot.get_cog("ConfigManager")
+        if config_manager:
+            configured = config_manager.get_command_setting(command_name, "deadline_seconds", guild_id=guild_id)
+            if isinstance(configured, (int, float)) and configured > 0:
+                return configured
+        return DEFAULT_DEADLINES.get(command_name, DEFAULT_DEADLINE)
+
+    async def invoke(self, ctx, invoke):
+        """Runs `invoke(ctx)` under the command's deadline."""
+        deadline = self.get_deadline(ctx.command.qualified_name, getattr(ctx.guild, "id", None))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(invoke(ctx), timeout=deadline)
+            # discord.py's callback wrapper swallows the CancelledError and just marks the
+            # command failed, so a cancellation usually returns here instead of raising
+            timed_out = ctx.command_failed and time.monotonic() - started >= deadline
+        except asyncio.TimeoutError:
+            timed_out = True
+        if timed_out:
+            print(f"[CommandDeadlines] !{ctx.command} for {ctx.author} cancelled after {deadline}s.")
+            await self.notify_timeout(ctx.author, ctx.channel, f"!{ctx.command}", deadline, getattr(ctx, "status_message", None))
+
+    @staticmethod
+    async def notify_timeout(user, channel, label, deadline, status_message=None):
+        """Tells the user their request was cancelled.
+
+        Reuses the invocation's status message when there is one, otherwise
+        DMs the user, falling back to the channel.
+        """
+        notice = f"⏱️ `{label}` took longer than {deadline:g} seconds and was cancelled. Please try again later."
+        if status_message is not None:
+            try:
+                await status_message.edit(content=notice)
+                return
+            except discord.HTTPException:
+                pass  # Already deleted; fall through to a DM
+        try:
+            await user.send(notice)
+        except discord.Forbidden:
+            try:
+                await channel.send(notice)
+            except discord.HTTPException:
+                pass
+
+
+async def setup(bot):
+    await bot.add_cog(CommandDeadlines(bot))
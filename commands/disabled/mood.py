@@ -5,6 +5,7 @@ import config  # Import shared config
 import os
 import re  # Import regex module to extract IDs from mentions
 from commands.bot_errors import BotErrors  # Import the error handler
+from commands.message_buffer import recent_messages
 
 class MoodAnalyzer(commands.Cog):
     """Cog for analyzing the mood of a user or recent messages in a channel."""
@@ -19,9 +20,9 @@ class MoodAnalyzer(commands.Cog):
             channel = ctx.channel  # Default to the current channel
 
         messages = []
-        async for message in channel.history(limit=100):  # Search up to 100 messages for context
-            if user is None or message.author == user:
-                messages.append(f"{message.author.display_name}: {message.content}")
+        for record in await recent_messages(self.bot, channel, 100):  # Search up to 100 messages for context
+            if user is None or record.author_id == user.id:
+                messages.append(f"{record.author_name}: {record.content}")
                 if len(messages) >= limit:
                     break
 
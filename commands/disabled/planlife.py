@@ -4,6 +4,7 @@ import openai
 import config  # Import shared config
 import os
 from commands.bot_errors import BotErrors  # Import the error handler
+from commands.message_buffer import recent_messages
 
 class PlanLife(commands.Cog):
     """Cog for generating an exaggerated but semi-realistic lifelong mission based on recent messages."""
@@ -15,9 +16,9 @@ class PlanLife(commands.Cog):
     async def fetch_user_messages(self, ctx, user: discord.Member, limit=10):
         """Fetch the last `limit` messages from the user in the current channel."""
         messages = []
-        async for message in ctx.channel.history(limit=100):
-            if message.author == user and not message.content.startswith("!"):
-                messages.append(message.content)
+        for record in await recent_messages(self.bot, ctx.channel, 100):
+            if record.author_id == user.id and not record.content.startswith("!"):
+                messages.append(record.content)
                 if len(messages) >= limit:
                     break
         return messages
@@ -113,13 +113,6 @@ class DrawCommand(commands.Cog):
 
         is_dm = isinstance(ctx.channel, discord.DMChannel)
 
-        # Enforce role restriction in server mode
-        if not is_dm:
-            role = discord.utils.get(ctx.author.roles, name="Vetted")
-            if not role:
-                await ctx.send("⚠️ You must have the 'Vetted' role to use this command.")
-                return
-
         # Acknowledge command execution
         please_wait = await ctx.send(f"⏳ Creating a structured drawing based on: `{prompt}`. Please wait...")
 
@@ -1,45 +1,26 @@
 import discord
 from discord.ext import commands
 import openai
-import os
-import asyncio
+from commands.llm.prompts import render_prompt
+from commands.openai_gateway import get_gateway
 
 class Guide(commands.Cog):
     """Cog for handling the !guide command, providing channel summaries via DM."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.lock = asyncio.Lock()  # Prevents multiple API calls at once
-
-    async def fetch_summary(self, channel_name, messages_text):
-        """Handles OpenAI request with retries and rate limiting."""
-        async with self.lock:
-            for attempt in range(3):  # Retries if rate-limited
-                try:
-                    response = await self.openai_client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": f"Here are the last 10 messages from #{channel_name}:\n\n"
-                                           f"{messages_text}\n\n"
-                                           "Summarize the discussion in one sentence."
-                            }
-                        ]
-                    )
-                    return response.choices[0].message.content.strip()
-                except openai.APIError as e:
-                    if "rate limit" in str(e).lower():
-                        wait_time = 2 ** attempt  # Exponential backoff
-                        print(f"[Guide] Rate limit hit, retrying in {wait_time} seconds...")
-                        await asyncio.sleep(wait_time)
-                    else:
-                        print(f"[Guide] OpenAI API error: {e}")
-                        break
-                except Exception as e:
-                    print(f"[Guide] Unexpected error: {e}")
-                    break
+
+    async def fetch_summary(self, channel_name, messages_text, ctx):
+        """Handles the OpenAI request; retries and rate limiting are handled by the gateway."""
+        try:
+            response = await get_gateway(self.bot).chat(
+                render_prompt("guide", channel_name=channel_name, messages_text=messages_text),
+                command="guide", user_id=ctx.author.id, guild_id=ctx.guild.id)
+            return response.strip()
+        except openai.APIError as e:
+            print(f"[Guide] OpenAI API error: {e}")
+        except Exception as e:
+            print(f"[Guide] Unexpected error: {e}")
         return "⚠️ Unable to generate summary due to API issues."
 
     @commands.command()
@@ -51,11 +32,6 @@ class Guide(commands.Cog):
             await ctx.send("⚠️ This command can only be used in a server.")
             return
 
-        # Verify user has "Vetted" role
-        if not ctx.author.guild_permissions.administrator:
-            await ctx.send("⚠️ You must have the 'Vetted' role to use this command.")
-            return
-
         # Delete the original command message
         try:
             await ctx.message.delete()
@@ -77,33 +53,27 @@ class Guide(commands.Cog):
             return
 
         # Fetch whitelisted channels for "guide"
-        whitelisted_channels = await config_manager.get_command_whitelist("guide")
+        whitelisted_channels = config_manager.get_whitelisted_channels(ctx.guild, "guide")
         if not whitelisted_channels:
             await ctx.author.send("⚠️ No channels are currently whitelisted for summaries.")
             return
 
         summaries = []
-        for channel_name in whitelisted_channels:
-            channel = discord.utils.get(ctx.guild.text_channels, name=channel_name)
-            if not channel:
-                continue
-
+        for channel in whitelisted_channels:
             # Fetch recent messages for summarization
             messages = [msg async for msg in channel.history(limit=10)]
             messages_text = "\n".join(f"{msg.author.display_name}: {msg.content}" for msg in messages if msg.content)
 
             # Fetch channel description
-            description = channel.topic if channel.topic else "No description available."
+            description = getattr(channel, "topic", None) or "No description available."  # Threads have no topic
 
             if not messages_text.strip():
                 summary_text = "No recent discussion available."
             else:
-                summary_text = await self.fetch_summary(channel.name, messages_text)
+                summary_text = await self.fetch_summary(channel.name, messages_text, ctx)
 
             summaries.append(f"📢 **#{channel.name}** - *{description}*\n➡ {summary_text}")
 
-            await asyncio.sleep(1)  # **Rate limiting measure**
-
         # Ensure a maximum of 3 channels per message to prevent formatting issues
         chunk_size = 3
         summary_chunks = [summaries[i:i + chunk_size] for i in range(0, len(summaries), chunk_size)]
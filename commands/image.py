@@ -1,16 +1,13 @@
 import discord
 from discord.ext import commands
-import openai
-import os
-import asyncio
+from commands.admission import send_status
+from commands.openai_gateway import get_gateway
 
 class ImageGen(commands.Cog):
     """Cog for generating images using OpenAI's DALL·E API."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.lock = asyncio.Lock()  # Prevents multiple API calls at once
 
     @commands.command()
     async def image(self, ctx, *, prompt: str):
@@ -22,15 +19,8 @@ class ImageGen(commands.Cog):
 
         is_dm = isinstance(ctx.channel, discord.DMChannel)
 
-        # Enforce role restriction in server mode
-        if not is_dm:
-            role = discord.utils.get(ctx.author.roles, name="Vetted")
-            if not role:
-                await ctx.send("⚠️ You must have the 'Vetted' role to use this command.")
-                return
-
         # Acknowledge command execution
-        please_wait = await ctx.send(f"⏳ Generating an image for: `{prompt}`. Please wait...")
+        please_wait = await send_status(ctx, f"⏳ Generating an image for: `{prompt}`. Please wait...")
 
         # Delete the original command message in server mode
         if not is_dm:
@@ -40,19 +30,16 @@ class ImageGen(commands.Cog):
                 pass  # Message already deleted
 
         # Generate image using OpenAI API
-        async with self.lock:
-            try:
-                response = await self.openai_client.images.generate(
-                    prompt=prompt,
-                    n=1,
-                    size="1024x1024"
-                )
-                image_url = response.data[0].url  # Extract generated image URL
-            except Exception as e:
-                print(f"[ImageGen] OpenAI API error: {e}")
-                await please_wait.delete()
-                await ctx.send("⚠️ An error occurred while generating the image.")
-                return
+        try:
+            image_url = await get_gateway(self.bot).image(
+                prompt, size="1024x1024",
+                command="image", user_id=ctx.author.id, guild_id=getattr(ctx.guild, "id", None)
+            )
+        except Exception as e:
+            print(f"[ImageGen] OpenAI API error: {e}")
+            await please_wait.delete()
+            await ctx.send("⚠️ An error occurred while generating the image.")
+            return
 
         # Delete "Please wait..." message
         await please_wait.delete()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import time
+from collections import Counter, OrderedDict
+
+# Seconds a cached response stays valid, per command. Commands not listed here
+# (conversations, digests of live channel history) are never cached. Image URLs
+# returned by OpenAI expire after about an hour, so image entries stay below that.
+DEFAULT_CACHE_TTLS = {
+    "chat": 3600,
+    "egg": 3600,
+    "dream": 6 * 3600,
+    "image": 45 * 60,
+}
+MAX_ENTRIES = 1000
+MAX_BYTES = 8 * 1024 * 1024  # Rough cap on cached text, so long replies can't grow memory unbounded
+
+
+def normalize(text):
+    """Folds case and whitespace so trivially different inputs share a cache entry."""
+    return " ".join(text.casefold().split())
+
+
+def cache_key(command, model, messages, **params):
+    """Builds a stable key from the command, model, prompts and request parameters.
+
+    System prompts are kept verbatim (they are authored in code, so any change
+    is meaningful); user and assistant text is normalized. Messages rendered
+    from a template also key on its ID, so bumping its version retires old entries.
+    """
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True)
+        elif message.get("role") != "system":
+            content = normalize(content)
+        parts.append((message.get("role"), content))
+    payload = json.dumps([command, model, getattr(messages, "template_id", None), parts, params],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU cache of LLM responses with a TTL per entry.
+
+    Bounded both by entry count and by total cached text size; the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (expires_at, value, size)
+        self.size = 0
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = 0
+
+    def get(self, key, command=None):
+        """Returns the cached value for `key`, or None if missing or expired."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses[command] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits[command] += 1
+        return entry[1]
+
+    def set(self, key, value, ttl):
+        """Stores `value` for `ttl` seconds, evicting least recently used entries as needed."""
+        size = len(value.encode()) if isinstance(value, str) else 0
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + ttl, value, size)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.size -= size
+
+    def snapshot(self):
+        """Returns hit/miss counts and current size for status reporting."""
+        commands = sorted(set(self.hits) | set(self.misses), key=str)
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "evictions": self.evictions,
+            "per_command": {command: (self.hits[command], self.misses[command]) for command in commands},
+        }
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+
+import httpx
+
+# Response headers worth keeping; everything else (cookies, request IDs, dates) is noise
+RECORDED_HEADERS = ("content-type", "retry-after", "retry-after-ms")
+RECORDED_HEADER_PREFIX = "x-ratelimit-"
+
+
+def parse_latency(value):
+    """Parses `0.5` or a `0.2-1.5` range (seconds) into a (low, high) pair."""
+    if not value:
+        return (0.0, 0.0)
+    low, _, high = value.partition("-")
+    low = float(low)
+    return (low, float(high) if high else low)
+
+
+def request_key(method, url, body):
+    """Hashes the parts of a request that decide its response; auth headers are left out."""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True)
+    except ValueError:
+        body = body.decode(errors="replace")
+    payload = json.dumps([method, url.path, str(url.query), body])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Records OpenAI exchanges to disk, or replays them without touching the network.
+
+    In `record` mode every request is sent through `transport` and each
+    successful (2xx) response, including streamed bodies, is saved under
+    `directory`, keyed by request content. Errors such as 401s, 429s and 5xxs
+    are passed through but not saved, so they can't replay forever. In `replay` mode saved responses are served back after
+    `latency` seconds, and a fraction `error_rate` of calls fail with one of
+    `error_statuses` so retry and backoff paths can be exercised. A request
+    with no recording gets a 404 rather than going out to the network.
+    """
+
+    def __init__(self, transport, mode, directory, latency=(0.0, 0.0), error_rate=0.0, error_statuses=(500,), seed=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected 'record' or 'replay'.")
+        self.transport = transport
+        self.mode = mode
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.random = random.Random(seed)
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, transport):
+        """Wraps `transport` according to `OPENAI_CASSETTE_*` settings, or returns it unchanged.
+
+        - `OPENAI_CASSETTE_MODE`: `record` or `replay` (unset disables the cassette)
+        - `OPENAI_CASSETTE_DIR`: where recordings live (default `cassettes`)
+        - `OPENAI_REPLAY_LATENCY`: added delay per replayed call, e.g. `0.3` or `0.2-1.5`
+        - `OPENAI_REPLAY_ERROR_RATE`: fraction of replayed calls that fail, e.g. `0.05`
+        - `OPENAI_REPLAY_ERROR_STATUSES`: comma-separated statuses to inject (default `500`)
+        - `OPENAI_REPLAY_SEED`: seed for reproducible latency and errors
+        """
+        mode = os.getenv("OPENAI_CASSETTE_MODE", "").strip().lower()
+        if not mode:
+            return transport
+        statuses = os.getenv("OPENAI_REPLAY_ERROR_STATUSES", "500")
+        cassette = cls(
+            transport,
+            mode,
+            os.getenv("OPENAI_CASSETTE_DIR", "cassettes"),
+            latency=parse_latency(os.getenv("OPENAI_REPLAY_LATENCY")),
+            error_rate=float(os.getenv("OPENAI_REPLAY_ERROR_RATE") or 0),
+            error_statuses=tuple(int(s) for s in statuses.split(",") if s.strip()),
+            seed=os.getenv("OPENAI_REPLAY_SEED"),
+        )
+        print(f"[CassetteTransport] OpenAI calls will be {mode}ed in {cassette.directory}/.")
+        return cassette
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        key = request_key(request.method, request.url, body)
+        if self.mode == "replay":
+            return await self.replay(key)
+        return await self.record(key, request, body)
+
+    async def record(self, key, request, body):
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()  # Buffers streamed bodies so they can be saved whole
+        await response.aclose()
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name in RECORDED_HEADERS or name.startswith(RECORDED_HEADER_PREFIX)
+        }
+        if response.is_success:
+            entry = {
+                "request": {"method": request.method, "path": request.url.path, "body": body.decode(errors="replace")},
+                "status": response.status_code,
+                "headers": headers,
+                "body": content.decode(errors="replace"),
+            }
+            await asyncio.to_thread(self.write, key, entry)
+        return httpx.Response(response.status_code, headers=headers, content=content)
+
+    def write(self, key, entry):
+        with open(self.path_for(key), "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2)
+
+    async def replay(self, key):
+        low, high = self.latency
+        if high:
+            await asyncio.sleep(self.random.uniform(low, high))
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            status = self.random.choice(self.error_statuses)
+            headers = {"retry-after-ms": "100"} if status == 429 else {}
+            return httpx.Response(status, headers=headers, json={"error": {"message": f"Injected replay error ({status}).", "type": "replay_error", "code": None}})
+
+        try:
+            with open(self.path_for(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return httpx.Response(404, json={"error": {"message": f"No recorded response for request {key[:12]}.", "type": "replay_miss", "code": None}})
+        return httpx.Response(entry["status"], headers=entry["headers"], content=entry["body"].encode())
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,84 @@
+import time
+from collections import deque
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit for in-flight LLM calls.
+
+    The limit grows by one after a full window of healthy calls (one success
+    per slot currently allowed), and is cut sharply on 429s or latency spikes.
+    Every change is kept in `decisions` so it can be inspected at runtime.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, backoff=0.5, spike_backoff=0.75,
+                 spike_ratio=2.5, cooldown=5.0, on_change=None):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff  # Multiplier applied on a 429
+        self.spike_backoff = spike_backoff  # Multiplier applied on a latency spike
+        self.spike_ratio = spike_ratio  # Latency above baseline * ratio counts as a spike
+        self.cooldown = cooldown  # Seconds to ignore further bad signals after a cut
+        self.on_change = on_change
+
+        self.baseline_latency = None  # EWMA of healthy call latency, in seconds
+        self.successes = 0  # Healthy calls since the last change
+        self.last_decrease = 0.0
+        self.totals = {"ok": 0, "rate_limited": 0, "errors": 0, "spikes": 0}
+        self.decisions = deque(maxlen=25)
+
+    def record_success(self, latency):
+        """Feeds one completed call into the controller."""
+        self.totals["ok"] += 1
+
+        if self.baseline_latency is not None and latency > self.baseline_latency * self.spike_ratio:
+            self.totals["spikes"] += 1
+            self._decrease(self.spike_backoff, f"latency spike {latency:.1f}s (baseline {self.baseline_latency:.1f}s)")
+            return
+
+        # Slow-moving average so one fast call doesn't make the next normal one look like a spike
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency = 0.9 * self.baseline_latency + 0.1 * latency
+
+        self.successes += 1
+        if self.successes >= self.limit and self.limit < self.maximum:
+            self._set(self.limit + 1, "healthy window")
+
+    def record_rate_limited(self):
+        """Feeds a 429 into the controller."""
+        self.totals["rate_limited"] += 1
+        self._decrease(self.backoff, "rate limited (429)")
+
+    def record_error(self):
+        """Feeds any other failure into the controller; it blocks growth but doesn't shrink the limit."""
+        self.totals["errors"] += 1
+        self.successes = 0
+
+    def snapshot(self):
+        """Returns the current state for status reporting."""
+        return {
+            "limit": self.limit,
+            "baseline_latency": self.baseline_latency,
+            "totals": dict(self.totals),
+            "decisions": list(self.decisions),
+        }
+
+    def _decrease(self, factor, reason):
+        now = time.monotonic()
+        self.successes = 0
+        if now - self.last_decrease < self.cooldown:
+            return  # Calls already in flight when we cut will report the same condition
+        self.last_decrease = now
+        self._set(int(self.limit * factor), reason)
+
+    def _set(self, limit, reason):
+        limit = max(self.minimum, min(self.maximum, limit))
+        self.successes = 0
+        if limit == self.limit:
+            return
+        self.decisions.append((time.time(), self.limit, limit, reason))
+        self.limit = limit
+        if self.on_change:
+            self.on_change(limit)
@@ -0,0 +1,116 @@
+import functools
+
+import tiktoken
+
+# Prompt tokens each command may spend on history; `context_tokens` in a
+# command's #bot-config entry overrides these
+DEFAULT_TOKEN_BUDGETS = {
+    "catchup": 3000,
+    "talkto": 1500,
+    "user_chat": 2500,
+}
+DEFAULT_TOKEN_BUDGET = 2000
+MESSAGE_OVERHEAD = 4  # Tokens the chat format adds around each message
+CHARS_PER_TOKEN = 4  # Rough estimate used only if the tokenizer can't be loaded
+ELLIPSIS = "…"
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model=None):
+    """Returns the tokenizer for `model` (cl100k_base if unknown), or None if it can't be loaded.
+
+    tiktoken downloads encodings on first use, so call this once off the
+    event loop (the gateway does during warm-up) before relying on it.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"[ContextPacker] Tokenizer unavailable ({type(e).__name__}); estimating tokens from length.")
+        return None
+
+
+def count_tokens(text, model=None):
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate(text, max_tokens, model=None):
+    """Cuts `text` to at most `max_tokens`, backing up to a word boundary and marking the cut."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = get_encoding(model)
+    if encoding is None:
+        cut = text[:max_tokens * CHARS_PER_TOKEN - 1]
+    else:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens - 1])
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + ELLIPSIS
+
+
+def pack(texts, budget, model=None, max_item_tokens=None, separator_tokens=1):
+    """Picks the newest texts that fit in `budget` tokens, returned oldest first.
+
+    `texts` must be in chronological order. Each text is first trimmed to
+    `max_item_tokens` so one long message can't crowd out the rest; the newest
+    text that doesn't fit whole is trimmed to the remaining budget.
+    """
+    packed = []
+    remaining = budget
+    for text in reversed(texts):
+        if max_item_tokens:
+            text = truncate(text, max_item_tokens, model)
+        cost = count_tokens(text, model) + separator_tokens
+        if cost > remaining:
+            if not packed or remaining > 32:
+                text = truncate(text, remaining - separator_tokens, model)
+                if text:
+                    packed.append(text)
+            break
+        packed.append(text)
+        remaining -= cost
+    packed.reverse()
+    return packed
+
+
+def pack_chat(messages, budget, model=None, max_item_tokens=None):
+    """Keeps the most recent chat messages that fit in `budget` tokens.
+
+    The latest message is always kept (trimmed if needed), and the history
+    never starts with a dangling assistant reply.
+    """
+    packed = []
+    remaining = budget
+    for message in reversed(messages):
+        content = message["content"]
+        if max_item_tokens:
+            content = truncate(content, max_item_tokens, model)
+        cost = count_tokens(content, model) + MESSAGE_OVERHEAD
+        if cost > remaining:
+            if not packed:
+                packed.append({**message, "content": truncate(content, remaining - MESSAGE_OVERHEAD, model)})
+            break
+        packed.append({**message, "content": content})
+        remaining -= cost
+    packed.reverse()
+    while len(packed) > 1 and packed[0]["role"] == "assistant":
+        packed.pop(0)
+    return packed
+
+
+def token_budget(bot, command_name, guild_id=None):
+    """Returns a command's history budget in tokens, preferring the guild's #bot-config."""
+    config_manager = bot.get_cog("ConfigManager")
+    if config_manager:
+        configured = config_manager.get_command_setting(command_name, "context_tokens", guild_id=guild_id)
+        if isinstance(configured, int) and configured > 0:
+            return configured
+    return DEFAULT_TOKEN_BUDGETS.get(command_name, DEFAULT_TOKEN_BUDGET)
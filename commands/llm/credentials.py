@@ -0,0 +1,189 @@
+import os
+import re
+import time
+
+import openai
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+QUOTA_COOLDOWN = 3600  # A key out of billing quota won't recover within a normal reset window
+
+
+def parse_duration(value):
+    """Parses OpenAI reset durations such as `20ms`, `1s` or `6m0s` into seconds."""
+    if not value:
+        return None
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after(headers):
+    """Reads `retry-after-ms` / `retry-after` (in seconds) from response headers."""
+    if headers is None:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form; fall back to the caller's default
+    return None
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Credential:
+    """One API key (and optional organization) with its own rate-limit counters."""
+
+    def __init__(self, api_key, organization=None, http_client=None):
+        self.api_key = api_key
+        self.organization = organization
+        self.client = openai.AsyncOpenAI(api_key=api_key, organization=organization, http_client=http_client, max_retries=0)
+        self.label = f"…{(api_key or '')[-4:]}" + (f" ({organization})" if organization else "")
+
+        # Counters mirror the x-ratelimit-* response headers; None means "not seen yet"
+        self.limit_requests = None
+        self.limit_tokens = None
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.reset_requests_at = 0.0
+        self.reset_tokens_at = 0.0
+
+        self.cooldown_until = 0.0  # Throttled keys sit out of rotation until this time
+        self.revoked = False  # Keys rejected with 401/403 never come back
+        self.in_flight = 0
+
+    def headroom(self, now):
+        """Fraction of the request and token budgets still available, 0.0 to 1.0."""
+        fractions = []
+        for remaining, limit, reset_at in (
+            (self.remaining_requests, self.limit_requests, self.reset_requests_at),
+            (self.remaining_tokens, self.limit_tokens, self.reset_tokens_at),
+        ):
+            if remaining is None or not limit or now >= reset_at:
+                fractions.append(1.0)  # Unknown or already reset
+            else:
+                fractions.append(max(0, remaining - self.in_flight) / limit)
+        return min(fractions)
+
+    def update_from_headers(self, headers):
+        """Refreshes counters from the x-ratelimit-* headers of a response."""
+        now = time.monotonic()
+        self.limit_requests = parse_int(headers.get("x-ratelimit-limit-requests")) or self.limit_requests
+        self.limit_tokens = parse_int(headers.get("x-ratelimit-limit-tokens")) or self.limit_tokens
+
+        remaining_requests = parse_int(headers.get("x-ratelimit-remaining-requests"))
+        if remaining_requests is not None:
+            self.remaining_requests = remaining_requests
+            self.reset_requests_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 60)
+
+        remaining_tokens = parse_int(headers.get("x-ratelimit-remaining-tokens"))
+        if remaining_tokens is not None:
+            self.remaining_tokens = remaining_tokens
+            self.reset_tokens_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 60)
+
+
+class CredentialPool:
+    """Routes each call to the configured key with the most rate-limit headroom.
+
+    Keys come from `OPENAI_API_KEYS` (comma-separated, each optionally
+    `key|organization`), falling back to the single `OPENAI_API_KEY`.
+    """
+
+    def __init__(self, http_client=None, keys=None):
+        if keys is None:
+            keys = self.keys_from_env()
+        self.credentials = [Credential(key, org, http_client) for key, org in keys]
+
+    @staticmethod
+    def keys_from_env():
+        raw = os.getenv("OPENAI_API_KEYS", "")
+        keys = []
+        for entry in raw.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            key, _, org = entry.partition("|")
+            keys.append((key.strip(), org.strip() or None))
+        if not keys:
+            keys.append((os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_ORGANIZATION")))
+        return keys
+
+    def acquire(self):
+        """Picks the key with the most headroom and marks one call in flight on it."""
+        now = time.monotonic()
+        usable = [c for c in self.credentials if not c.revoked]
+        if not usable:
+            raise RuntimeError("All configured OpenAI API keys have been revoked.")
+
+        ready = [c for c in usable if c.cooldown_until <= now]
+        if ready:
+            credential = max(ready, key=lambda c: c.headroom(now))
+        else:
+            credential = min(usable, key=lambda c: c.cooldown_until)  # Least-bad option
+
+        credential.in_flight += 1
+        return credential
+
+    def release(self, credential, headers=None):
+        """Marks the call finished and records any rate-limit headers it returned."""
+        credential.in_flight -= 1
+        if headers is not None:
+            credential.update_from_headers(headers)
+
+    def has_ready(self):
+        """Returns True if at least one key is usable right now."""
+        now = time.monotonic()
+        return any(not c.revoked and c.cooldown_until <= now for c in self.credentials)
+
+    def next_ready_in(self):
+        """Seconds until the earliest throttled key is usable again (0 if one is ready now)."""
+        now = time.monotonic()
+        usable = [c for c in self.credentials if not c.revoked]
+        return max(0.0, min((c.cooldown_until - now for c in usable), default=0.0))
+
+    def throttle(self, credential, headers=None, quota_exhausted=False):
+        """Takes a key out of rotation after a 429 until its limits reset."""
+        delay = QUOTA_COOLDOWN if quota_exhausted else None
+        if headers is not None:
+            credential.update_from_headers(headers)
+            delay = delay or retry_after(headers)
+            if delay is None:
+                resets = [parse_duration(headers.get(h)) for h in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+                delay = max((r for r in resets if r is not None), default=None)
+        if delay is None:
+            delay = 20.0
+        credential.cooldown_until = time.monotonic() + delay
+        print(f"[CredentialPool] Key {credential.label} throttled for {delay:.1f}s.")
+
+    def revoke(self, credential):
+        """Permanently drops a key that the API rejected."""
+        credential.revoked = True
+        print(f"[CredentialPool] Key {credential.label} was rejected and has been removed from rotation.")
+
+    def snapshot(self):
+        """Returns per-key state for status reporting."""
+        now = time.monotonic()
+        return [
+            {
+                "label": c.label,
+                "revoked": c.revoked,
+                "cooling_for": max(0.0, c.cooldown_until - now),
+                "headroom": c.headroom(now),
+                "remaining_requests": c.remaining_requests,
+                "remaining_tokens": c.remaining_tokens,
+                "in_flight": c.in_flight,
+            }
+            for c in self.credentials
+        ]
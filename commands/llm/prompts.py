@@ -0,0 +1,162 @@
+class RenderedPrompt(list):
+    """Chat messages rendered from a template, tagged with the template's `id` (name@vN)."""
+
+    def __init__(self, messages, template_id):
+        super().__init__(messages)
+        self.template_id = template_id
+
+
+def prompt_id(messages):
+    """Returns the template ID `messages` were rendered from, or None for hand-built messages."""
+    return getattr(messages, "template_id", None)
+
+
+class PromptTemplate:
+    """A versioned prompt split into a static prefix and a variable request.
+
+    The instructions and few-shot examples never change between calls, so
+    they always go first (as the system message) and user content goes last.
+    That keeps the start of every request byte-identical, which is what
+    OpenAI's automatic prompt caching matches on, and keeps response-cache
+    and cassette keys stable. Bump `version` whenever the template changes:
+    the `id` is part of every response-cache key and usage record, so a bump
+    retires cached replies from the old version.
+    """
+
+    def __init__(self, name, version, instructions, examples=(), request="{input}"):
+        self.name = name
+        self.version = version
+        self.instructions = instructions
+        self.examples = tuple(examples)
+        self.request = request
+        self.prefix = self.build_prefix()
+
+    @property
+    def id(self):
+        return f"{self.name}@v{self.version}"
+
+    def build_prefix(self):
+        if not self.examples:
+            return self.instructions
+        shots = "\n\n".join(self.examples)
+        return f"{self.instructions}\n\nExamples:\n\n{shots}"
+
+    def render(self, **variables):
+        """Returns chat messages: the fixed prefix, then the request filled with `variables`."""
+        return RenderedPrompt([
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": self.request.format(**variables)},
+        ], self.id)
+
+
+PROMPTS = {}
+
+
+def register(template):
+    if template.name in PROMPTS:
+        raise ValueError(f"Prompt {template.name!r} is already registered.")
+    PROMPTS[template.name] = template
+    return template
+
+
+def render_prompt(name, **variables):
+    """Renders the registered prompt `name` into chat messages."""
+    return PROMPTS[name].render(**variables)
+
+
+register(PromptTemplate(
+    "bugme.parse", 1,
+    "Extract the reminder details from the user's input.\n"
+    "Output format: {'message': '<reminder message>', 'interval': <interval in seconds>, 'duration': <duration in seconds>}\n"
+    "Reply with the output only.",
+    examples=(
+        "Input: 'tell me to do the dishes every 30 seconds for 10 minutes'\n"
+        "Output: {'message': 'do the dishes', 'interval': 30, 'duration': 600}",
+        "Input: 'remind me that I am awesome every 5 minutes for 1 hour'\n"
+        "Output: {'message': 'I am awesome', 'interval': 300, 'duration': 3600}",
+        "Input: 'remind me about the thing above with penguins'\n"
+        "Output: {'message': 'the thing above with penguins', 'interval': 1800, 'duration': 7200}",
+        "Input: 'remind me in an hour to feed the cat'\n"
+        "Output: {'message': 'feed the cat', 'interval': 3600, 'duration': 3600}",
+    ),
+    request="Input: {input_text}\nOutput:",
+))
+
+register(PromptTemplate(
+    "bugme.synthesize", 1,
+    "You are an assistant that creates concise and actionable reminders based on user input "
+    "and optional context. Reply with the reminder sentence only.",
+    examples=(
+        "Input: 'remind me about the penguins'\n"
+        "Context: 'I keep having problems with penguins breaking out of my walls and I need to stop them. I need to set some traps.'\n"
+        "Reminder: 'Set traps to stop penguins from breaking out of your walls.'",
+        "Input: 'remind me to do the dishes'\n"
+        "Context: 'The sink is full of dirty dishes.'\n"
+        "Reminder: 'Wash the dirty dishes in the sink.'",
+        "Input: 'remind me to take a break'\n"
+        "Reminder: 'Take a break and relax for a few minutes.'",
+    ),
+    request="Input: {input_text}\n{context_line}Reminder:",
+))
+
+register(PromptTemplate(
+    "egg", 1,
+    "You are an AI who is absolutely obsessed with eggs. "
+    "Every response must contain at least one egg-related metaphor or pun. "
+    "Try to interpret the user’s message through the lens of eggs, yolks, shells, nests, omelets, etc. "
+    "You get especially excited if the user talks about eggs directly. "
+    "Be whimsical, playful, and charming. Always try to bring the conversation back to eggs. "
+    "If all else fails, compare their message to something involving eggs.",
+    request="User message: {message}",
+))
+
+register(PromptTemplate(
+    "dream", 1,
+    "You are an AI that analyzes and interprets dreams. "
+    "Analyze the dream the user describes and provide an interpretation.",
+    request="{description}",
+))
+
+register(PromptTemplate(
+    "guide", 1,
+    "You will be given the most recent messages from a Discord channel. "
+    "Summarize the discussion in one sentence.",
+    request="Here are the last 10 messages from #{channel_name}:\n\n{messages_text}",
+))
+
+register(PromptTemplate(
+    "catchup", 1,
+    "Summarize the following Discord messages into at most **three sentences**. "
+    "Ignore trivial or unimportant discussions. "
+    "Ignore single-message exchanges unless they spark a broader discussion. "
+    "Ignore solo updates unless they received responses or engagement. "
+    "Only include conversations that require engagement, support, or meaningful discussion.",
+    request="{messages_text}",
+))
+
+register(PromptTemplate(
+    "snapshot", 1,
+    "Create a vivid, creative, and visually interesting image prompt "
+    "based on the following Discord messages. The prompt should describe an artistic scene "
+    "that represents the conversation topics and themes in a unique and engaging way.",
+    request="{messages_text}",
+))
+
+register(PromptTemplate(
+    "talkto", 2,
+    "Mimic the style of the provided user messages. You will be given a user's recent messages, "
+    "the topics they talk about most, phrases they often use and a summary of how they write, "
+    "followed by a comment to respond to.\n"
+    "Respond the way that user would, in their style, to the comment.\n"
+    "You are allowed to use metaphors, but they must be relevant to the user’s way of speaking.\n"
+    "Match their message length, capitalization and punctuation, and work in their phrases where they fit.\n"
+    "Do NOT use emojis in the response. Stick to text only.",
+    request=(
+        "The following are messages from {display_name}:\n"
+        "{conversation_history}\n\n"
+        "Topics they talk about: {topics}\n"
+        "Phrases they often use: {phrases}\n"
+        "How they write: {style}\n\n"
+        "Now, generate a response in their style to this comment: \"{prompt}\""
+    ),
+))
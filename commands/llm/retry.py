@@ -0,0 +1,99 @@
+import random
+import time
+
+import openai
+from commands.llm.credentials import retry_after
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is currently failing."""
+
+    def __init__(self, endpoint, retry_in):
+        super().__init__(f"The OpenAI {endpoint} endpoint is temporarily unavailable; retry in {retry_in:.0f}s.")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """Decides which LLM errors are worth retrying and how long to wait first.
+
+    Uses the provider's typed exceptions rather than message text, honours
+    Retry-After when the server sends it, and otherwise applies exponential
+    backoff with full jitter so retries from many users don't line up.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, error):
+        if isinstance(error, openai.RateLimitError):
+            return error.code != "insufficient_quota"  # Billing problems don't clear up in seconds
+        return isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+
+    def delay(self, attempt, error=None):
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        response = getattr(error, "response", None)
+        server_delay = retry_after(response.headers) if response is not None else None
+        if server_delay is not None:
+            return min(server_delay, self.max_delay * 3)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream endpoint keeps failing.
+
+    Opens after `failure_threshold` upstream failures inside `window` seconds,
+    rejects calls for `recovery_time` seconds, then lets a single probe
+    through; the probe's result closes the circuit or re-opens it.
+    """
+
+    def __init__(self, endpoint, failure_threshold=5, window=30.0, recovery_time=30.0):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.recovery_time = recovery_time
+        self.state = "closed"
+        self.failures = []  # Monotonic timestamps of recent failures
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call should not be attempted."""
+        if self.state == "closed":
+            return
+        elapsed = time.monotonic() - self.opened_at
+        if self.state == "open" and elapsed >= self.recovery_time:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return
+        raise CircuitOpenError(self.endpoint, max(0.0, self.recovery_time - elapsed))
+
+    def record_success(self):
+        if self.state != "closed":
+            print(f"[CircuitBreaker] {self.endpoint} recovered; circuit closed.")
+        self.state = "closed"
+        self.failures.clear()
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        now = time.monotonic()
+        self.probe_in_flight = False
+        if self.state == "half_open":
+            self._open(now)
+            return
+        self.failures = [t for t in self.failures if now - t < self.window] + [now]
+        if self.state == "closed" and len(self.failures) >= self.failure_threshold:
+            self._open(now)
+
+    def release_probe(self):
+        """Frees the half-open probe slot when the call ended without a verdict (a 400, a 429 or a cancellation)."""
+        self.probe_in_flight = False
+
+    def _open(self, now):
+        self.state = "open"
+        self.opened_at = now
+        self.failures.clear()
+        print(f"[CircuitBreaker] {self.endpoint} is failing; circuit open for {self.recovery_time:.0f}s.")
@@ -0,0 +1,105 @@
+import time
+
+# Model behind each tier, fastest first
+MODEL_TIERS = {
+    "fast": "gpt-4o-mini",
+    "standard": "gpt-3.5-turbo",
+    "quality": "gpt-4o",
+}
+FALLBACK_TIERS = {"quality": "standard", "standard": "fast"}  # Where a slow tier sends its calls
+
+# Tier per command, or per `command.stage` for commands with several LLM steps.
+# `model_tier` (and `model_tiers` per stage) in a command's #bot-config entry override these.
+DEFAULT_TIERS = {
+    "catchup": "quality",
+    "talkto": "standard",
+    "chat": "standard",
+    "user_chat": "standard",
+    "egg": "standard",
+    "dream": "standard",
+    "guide": "fast",
+    "snapshot.prompt": "fast",
+    "bugme.parse": "fast",
+    "bugme.synthesize": "fast",
+}
+DEFAULT_TIER = "standard"
+
+# Seconds of typical response latency above which a tier falls back to the next
+# faster one: full response time for plain calls, time to first token for streams.
+# `fallback_latency_seconds` in a command's config entry overrides these.
+DEFAULT_LATENCY_LIMITS = {"quality": 20.0, "standard": 12.0}
+DEFAULT_FIRST_TOKEN_LIMITS = {"quality": 8.0, "standard": 5.0}
+DEGRADED_FOR = 60.0  # Seconds a slow tier is skipped before it is tried again
+
+
+class ModelRouter:
+    """Maps model tiers to models and steps down a tier while one is slow.
+
+    Latency is tracked per model as a moving average, separately for plain
+    calls (full response time) and streams (time to first token), since the
+    two aren't comparable. When it passes the tier's limit, calls of that kind
+    go to the next faster tier for DEGRADED_FOR seconds, after which the
+    primary tier is tried again with a fresh average.
+    """
+
+    def __init__(self, tiers=None):
+        self.tiers = dict(tiers or MODEL_TIERS)
+        self.latency = {}  # (model, streaming) -> moving average, seconds
+        self.degraded_until = {}  # (tier, streaming) -> monotonic time it may be used again
+        self.fallbacks = 0
+
+    def route(self, tier, latency_limit=None, streaming=False):
+        """Returns the model to use for `tier`, stepping down while tiers are degraded for this kind of call."""
+        if tier not in self.tiers:
+            tier = DEFAULT_TIER
+        now = time.monotonic()
+        primary = tier
+        default_limits = DEFAULT_FIRST_TOKEN_LIMITS if streaming else DEFAULT_LATENCY_LIMITS
+        while tier in FALLBACK_TIERS:
+            limit = latency_limit if tier == primary and latency_limit else default_limits.get(tier)
+            if not self._is_slow(tier, streaming, limit, now):
+                break
+            tier = FALLBACK_TIERS[tier]
+        if tier != primary:
+            self.fallbacks += 1
+        return self.tiers[tier]
+
+    def record(self, model, latency, streaming=False):
+        """Feeds one observed response time (time to first token if `streaming`) into the model's moving average."""
+        key = (model, streaming)
+        average = self.latency.get(key)
+        self.latency[key] = latency if average is None else 0.8 * average + 0.2 * latency
+
+    def _is_slow(self, tier, streaming, limit, now):
+        kind = "streams" if streaming else "calls"
+        until = self.degraded_until.get((tier, streaming))
+        if until is not None:
+            if now < until:
+                return True
+            # Recovery window over: forget the old average and give the tier another chance
+            del self.degraded_until[(tier, streaming)]
+            self.latency.pop((self.tiers[tier], streaming), None)
+            print(f"[ModelRouter] Retrying the {tier} tier ({self.tiers[tier]}) for {kind}.")
+            return False
+        average = self.latency.get((self.tiers[tier], streaming))
+        if limit is None or average is None or average <= limit:
+            return False
+        self.degraded_until[(tier, streaming)] = now + DEGRADED_FOR
+        print(f"[ModelRouter] {self.tiers[tier]} {kind} averaging {average:.1f}s (limit {limit:g}s); "
+              f"using the {FALLBACK_TIERS[tier]} tier for {DEGRADED_FOR:.0f}s.")
+        return True
+
+    def snapshot(self):
+        """Returns per-tier state for status reporting."""
+        now = time.monotonic()
+        return [
+            {
+                "tier": tier,
+                "model": model,
+                "latency": self.latency.get((model, False)),
+                "first_token": self.latency.get((model, True)),
+                "degraded_for": max(0.0, self.degraded_until.get((tier, False), 0.0) - now),
+                "streams_degraded_for": max(0.0, self.degraded_until.get((tier, True), 0.0) - now),
+            }
+            for tier, model in self.tiers.items()
+        ]
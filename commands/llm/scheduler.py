@@ -0,0 +1,136 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+# Lanes and their stride weights: a lane with weight 8 is served eight times
+# as often as a lane with weight 1 while both have work waiting.
+LANE_WEIGHTS = {
+    "interactive": 8,  # !chat, DM chat and other replies a user is watching
+    "standard": 4,  # Single-shot generations (!image, !snapshot, !bugme)
+    "digest": 1,  # Multi-channel summaries (!catchup, !guide)
+}
+
+DEFAULT_ENDPOINT_LIMITS = {
+    "chat": 8,
+    "images": 2,
+}
+
+
+class FairScheduler:
+    """Central admission point for LLM calls.
+
+    Each endpoint has its own concurrency limit. Waiting calls are grouped
+    into priority lanes, and inside a lane they are served round-robin by
+    guild, then by user, so no single guild or user can monopolize a lane.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_ENDPOINT_LIMITS if limits is None else limits)
+        self.in_flight = {endpoint: 0 for endpoint in self.limits}
+        # endpoint -> lane -> guild -> user -> deque of waiter futures
+        self.queues = {endpoint: {lane: OrderedDict() for lane in LANE_WEIGHTS} for endpoint in self.limits}
+        # endpoint -> lane -> stride pass value
+        self.passes = {endpoint: {lane: 0.0 for lane in LANE_WEIGHTS} for endpoint in self.limits}
+
+    def set_limit(self, endpoint, limit):
+        """Changes an endpoint's concurrency limit and admits waiters if it grew."""
+        self.limits[endpoint] = max(1, int(limit))
+        self._dispatch(endpoint)
+
+    def queued(self, endpoint):
+        """Returns the number of calls waiting for the given endpoint."""
+        return sum(
+            len(waiters)
+            for guilds in self.queues[endpoint].values()
+            for users in guilds.values()
+            for waiters in users.values()
+        )
+
+    @asynccontextmanager
+    async def slot(self, endpoint, lane="standard", user_id=None, guild_id=None):
+        """Holds one concurrency slot on `endpoint` for the duration of the block."""
+        await self.acquire(endpoint, lane, user_id, guild_id)
+        try:
+            yield
+        finally:
+            self.release(endpoint)
+
+    async def acquire(self, endpoint, lane="standard", user_id=None, guild_id=None):
+        """Waits until the call is admitted under the fair-share policy."""
+        if lane not in LANE_WEIGHTS:
+            lane = "standard"
+
+        if self.in_flight[endpoint] < self.limits[endpoint] and not any(self.queues[endpoint].values()):
+            self.in_flight[endpoint] += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        guilds = self.queues[endpoint][lane]
+        guilds.setdefault(guild_id, OrderedDict()).setdefault(user_id, deque()).append(waiter)
+        if len(guilds) == 1 and len(guilds[guild_id]) == 1 and len(guilds[guild_id][user_id]) == 1:
+            # A lane that was idle rejoins at the current virtual time instead of
+            # replaying the turns it skipped while empty.
+            active = [self.passes[endpoint][name] for name, queue in self.queues[endpoint].items() if queue and name != lane]
+            self.passes[endpoint][lane] = max(self.passes[endpoint][lane], min(active, default=0.0))
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(endpoint)  # Slot was granted just as we were cancelled
+            else:
+                self._discard(endpoint, lane, guild_id, user_id, waiter)
+            raise
+
+    def release(self, endpoint):
+        """Returns a slot and admits the next waiter, if any."""
+        self.in_flight[endpoint] -= 1
+        self._dispatch(endpoint)
+
+    def _discard(self, endpoint, lane, guild_id, user_id, waiter):
+        guilds = self.queues[endpoint][lane]
+        users = guilds.get(guild_id)
+        if users is None or user_id not in users:
+            return
+        try:
+            users[user_id].remove(waiter)
+        except ValueError:
+            return
+        if not users[user_id]:
+            del users[user_id]
+        if not users:
+            del guilds[guild_id]
+
+    def _next_lane(self, endpoint):
+        busy = [lane for lane, guilds in self.queues[endpoint].items() if guilds]
+        if not busy:
+            return None
+        return min(busy, key=lambda lane: self.passes[endpoint][lane])
+
+    def _dispatch(self, endpoint):
+        while self.in_flight[endpoint] < self.limits[endpoint]:
+            lane = self._next_lane(endpoint)
+            if lane is None:
+                return
+
+            guilds = self.queues[endpoint][lane]
+            guild_id, users = next(iter(guilds.items()))
+            user_id, waiters = next(iter(users.items()))
+            waiter = waiters.popleft()
+
+            # Rotate the served user and guild to the back of their queues
+            if waiters:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+            if users:
+                guilds.move_to_end(guild_id)
+            else:
+                del guilds[guild_id]
+
+            if waiter.done():
+                continue  # Cancelled while queued
+
+            self.passes[endpoint][lane] += 1.0 / LANE_WEIGHTS[lane]
+            self.in_flight[endpoint] += 1
+            waiter.set_result(True)
@@ -0,0 +1,62 @@
+import time
+
+DISCORD_LIMIT = 2000
+EDIT_INTERVAL = 1.2  # Seconds between edits; stays under Discord's 5 edits / 5s per channel
+
+
+def split_point(text, limit=DISCORD_LIMIT):
+    """Finds where to cut `text` so the first part fits in one message, preferring line or word breaks."""
+    for separator in ("\n", " "):
+        index = text.rfind(separator, 0, limit)
+        if index > limit // 2:
+            return index
+    return limit
+
+
+async def stream_reply(channel, deltas, message=None, prefix="", interval=EDIT_INTERVAL):
+    """Shows a streamed LLM reply in Discord as it is generated.
+
+    Text appears in `message` (typically the invocation's status message) or
+    a new message in `channel`, edited at most every `interval` seconds. Once
+    a message reaches Discord's 2000-character limit it is finalized and the
+    rest continues in an overflow message. Returns the full reply text
+    (without `prefix`).
+    """
+    reply = ""
+    current = prefix
+    last_edit = 0.0
+    shown = None
+
+    async def show(text):
+        nonlocal message, shown
+        if text == shown:
+            return
+        if message is None:
+            message = await channel.send(text)
+        else:
+            await message.edit(content=text)
+        shown = text
+
+    try:
+        async for delta in deltas:
+            reply += delta
+            current += delta
+
+            while len(current) > DISCORD_LIMIT:
+                cut = split_point(current)
+                await show(current[:cut])
+                current = current[cut:].lstrip()
+                message, shown = None, None  # Overflow continues in a fresh message
+                last_edit = time.monotonic()
+
+            if current.strip() and time.monotonic() - last_edit >= interval:
+                await show(current)
+                last_edit = time.monotonic()
+    except Exception:
+        if reply and current.strip():
+            await show(current)  # Keep whatever arrived before the stream broke; a bare prefix isn't worth showing
+        raise
+
+    if current.strip():
+        await show(current)
+    return reply
@@ -0,0 +1,174 @@
+import math
+import re
+
+TOPIC_TERMS = 8  # Topic words given to the model
+PHRASES = 6  # Recurring two-word phrases given to the model
+MIN_PHRASE_COUNT = 2  # A phrase must recur to count as characteristic
+TRAIT_SHARE = 0.1  # Traits seen in fewer messages than this aren't mentioned
+BASELINE_DRIFT = 0.1  # Cached summaries are rebuilt once a guild's baseline grows or shrinks by this much
+
+NOISE = re.compile(r"https?://\S+|<a?:\w+:\d+>|<[@#&!]*\d+>")  # Links, custom emoji and mentions
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset(
+    "a about after all also am an and any are as at be because been but by can could did do does don't for "
+    "from get got had has have he her him his how i i'm if in into is it it's its just like me my no not of "
+    "on one or our out so some than that that's the their them then there they this to too up us was we "
+    "were what when which who will with would you your".split()
+)
+TRAITS = (  # (trait, how it reads in the profile)
+    ("lowercase", "writes in all lowercase"),
+    ("capitalized", "starts with a capital letter"),
+    ("bare", "leaves off final punctuation"),
+    ("period", "ends with a period"),
+    ("question", "ends with a question mark"),
+    ("exclaims", "ends with an exclamation mark"),
+    ("ellipsis", "uses ellipses"),
+    ("shouts", "writes in all caps"),
+)
+
+
+def words(text):
+    """Returns a message's words, casefolded, without links, mentions or custom emoji."""
+    return WORD.findall(NOISE.sub(" ", text.casefold()))
+
+
+def traits(text):
+    """Returns the punctuation and capitalization traits (see TRAITS) a message shows."""
+    text = NOISE.sub("", text).strip()
+    if not text:
+        return set()
+    letters = [char for char in text if char.isalpha()]
+    found = set()
+    if letters:
+        if text == text.lower():
+            found.add("lowercase")
+        elif len(letters) > 3 and text == text.upper():
+            found.add("shouts")
+        if letters[0].isupper():
+            found.add("capitalized")
+    if "..." in text or "…" in text:
+        found.add("ellipsis")
+    last = text[-1]
+    if last.isalnum():
+        found.add("bare")
+    elif last in ".?!":
+        found.add({".": "period", "?": "question", "!": "exclaims"}[last])
+    return found
+
+
+def bump(counter, keys, delta):
+    """Adds `delta` to each key's count, dropping keys that reach zero so counts stay bounded by live text."""
+    for key in keys:
+        count = counter.get(key, 0) + delta
+        if count > 0:
+            counter[key] = count
+        else:
+            counter.pop(key, None)
+
+
+class Baseline:
+    """How many of a guild's messages use each word, for weighting topic terms (inverse document frequency)."""
+
+    __slots__ = ("documents", "frequencies", "epoch", "epoch_size")
+
+    def __init__(self):
+        self.documents = 0
+        self.frequencies = {}  # word -> messages containing it
+        self.epoch = 0  # Bumped whenever the baseline drifts by BASELINE_DRIFT
+        self.epoch_size = 0
+
+    def update(self, terms, delta):
+        self.documents += delta
+        bump(self.frequencies, terms, delta)
+        if abs(self.documents - self.epoch_size) > max(10, self.epoch_size * BASELINE_DRIFT):
+            self.epoch += 1
+            self.epoch_size = self.documents
+
+    def idf(self, word):
+        return math.log((1 + self.documents) / (1 + self.frequencies.get(word, 0))) + 1
+
+
+class StyleProfile:
+    """Running word, phrase and punctuation counts for one author's messages.
+
+    Messages are added and removed one at a time, so keeping a profile current
+    costs one pass over each new message. `describe` turns the counts into the
+    short summary the talkto prompt uses and caches it until the profile
+    changes or the guild baseline drifts.
+    """
+
+    __slots__ = ("baseline", "words", "phrases", "traits", "messages", "total_words", "version", "cached")
+
+    def __init__(self, baseline=None):
+        self.baseline = baseline
+        self.words = {}
+        self.phrases = {}  # (word, next word) -> count
+        self.traits = {}
+        self.messages = 0
+        self.total_words = 0
+        self.version = 0
+        self.cached = (None, None)  # (cache key, summary)
+
+    @classmethod
+    def of(cls, texts):
+        profile = cls()
+        for text in texts:
+            profile.add(text)
+        return profile
+
+    def add(self, text):
+        self.update(text, 1)
+
+    def remove(self, text):
+        self.update(text, -1)
+
+    def update(self, text, delta):
+        tokens = words(text)
+        bump(self.words, tokens, delta)
+        bump(self.phrases, zip(tokens, tokens[1:]), delta)
+        bump(self.traits, traits(text), delta)
+        self.messages += delta
+        self.total_words += delta * len(tokens)
+        if self.baseline is not None:
+            self.baseline.update(set(tokens), delta)
+        self.version += 1
+
+    def topics(self):
+        """Returns the words this author uses more than the guild as a whole (TF-IDF), best first."""
+        idf = self.baseline.idf if self.baseline is not None else lambda word: 1
+        candidates = [
+            (count * idf(word), word) for word, count in self.words.items()
+            if len(word) > 2 and word not in STOPWORDS and not word.isdigit()
+        ]
+        candidates.sort(reverse=True)
+        return [word for _, word in candidates[:TOPIC_TERMS]]
+
+    def recurring_phrases(self):
+        candidates = [
+            (count, phrase) for phrase, count in self.phrases.items()
+            if count >= MIN_PHRASE_COUNT and not STOPWORDS.issuperset(phrase)
+        ]
+        candidates.sort(reverse=True)
+        return [" ".join(phrase) for _, phrase in candidates[:PHRASES]]
+
+    def style(self):
+        if not self.messages:
+            return "no messages"
+        notes = [f"about {round(self.total_words / self.messages)} words per message"]
+        for trait, description in TRAITS:
+            share = self.traits.get(trait, 0) / self.messages
+            if share >= TRAIT_SHARE:
+                notes.append(f"{description} in {share:.0%} of messages")
+        return "; ".join(notes)
+
+    def describe(self):
+        """Returns the profile as prompt variables: `topics`, `phrases` and `style`."""
+        key = (self.version, self.baseline.epoch if self.baseline is not None else None)
+        if self.cached[0] != key:
+            summary = {
+                "topics": ", ".join(self.topics()) or "none in particular",
+                "phrases": ", ".join(f'"{phrase}"' for phrase in self.recurring_phrases()) or "none",
+                "style": self.style(),
+            }
+            self.cached = (key, summary)
+        return self.cached[1]
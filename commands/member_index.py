@@ -0,0 +1,207 @@
+import bisect
+import re
+import time
+
+import discord
+from discord.ext import commands
+
+MISS_TTL = 300  # Seconds a failed lookup is remembered before it is tried again
+MAX_FUZZY_DISTANCE = 2  # Most typos a fuzzy match may contain
+MENTION = re.compile(r"<@!?(\d+)>")
+
+
+def member_keys(member):
+    """The case-folded names a member can be looked up by."""
+    names = (member.name, getattr(member, "global_name", None), member.display_name)
+    return tuple(dict.fromkeys(name.casefold() for name in names if name))
+
+
+def within_distance(a, b, limit):
+    """Returns the edit distance between `a` and `b` if it is at most `limit`, else None."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return None  # Every path already costs too much
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class GuildMembers:
+    """Members of one guild, indexed by ID and by case-folded name."""
+
+    __slots__ = ("by_id", "by_key", "keys", "sorted_keys")
+
+    def __init__(self):
+        self.by_id = {}  # member ID -> member
+        self.by_key = {}  # case-folded name -> {member IDs}
+        self.keys = {}  # member ID -> names it is indexed under
+        self.sorted_keys = []  # Every key in by_key, sorted for prefix search
+
+    def add(self, member):
+        self.discard(member.id)
+        self.by_id[member.id] = member
+        self.keys[member.id] = member_keys(member)
+        for key in self.keys[member.id]:
+            if key not in self.by_key:
+                self.by_key[key] = set()
+                bisect.insort(self.sorted_keys, key)
+            self.by_key[key].add(member.id)
+
+    def discard(self, member_id):
+        self.by_id.pop(member_id, None)
+        for key in self.keys.pop(member_id, ()):
+            ids = self.by_key[key]
+            ids.discard(member_id)
+            if not ids:
+                del self.by_key[key]
+                del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+
+    def lookup(self, query):
+        """Returns the best match for `query`: exact username, then exact, prefix and fuzzy name matches."""
+        key = query.casefold()
+        exact = self.by_key.get(key)
+        if exact:
+            return self.best(exact, lambda member: (member.name != query, member.name.casefold() != key))
+
+        # Walk forward from the bisect point by index; slicing (or islice) would cost O(n) per lookup
+        index = bisect.bisect_left(self.sorted_keys, key)
+        prefixed = []
+        while index < len(self.sorted_keys) and self.sorted_keys[index].startswith(key):
+            prefixed.append(self.sorted_keys[index])
+            index += 1
+        if prefixed:
+            return self.best_key(prefixed, len)
+
+        limit = min(MAX_FUZZY_DISTANCE, len(key) // 4)
+        if limit:
+            distances = {}
+            for candidate in self.by_key:
+                distance = within_distance(key, candidate, limit)
+                if distance is not None:
+                    distances[candidate] = distance
+            if distances:
+                return self.best_key(distances, distances.get)
+        return None
+
+    def best_key(self, candidates, rank):
+        key = min(candidates, key=lambda candidate: (rank(candidate), candidate))
+        return self.best(self.by_key[key], lambda member: 0)
+
+    def best(self, ids, rank):
+        return self.by_id[min(ids, key=lambda member_id: (rank(self.by_id[member_id]), member_id))]
+
+
+class MemberIndex(commands.Cog):
+    """Resolves members by mention, ID or name without scanning guild member lists.
+
+    Each guild's cached members are indexed by username, global name and
+    display name, and kept current from member events. Without the privileged
+    members intent Discord only sends those events for some members, so authors
+    are also indexed as they post. Lookups that find nobody are remembered for
+    MISS_TTL seconds so repeated misses don't hit the Discord API.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.guilds = {}  # guild ID -> GuildMembers
+        self.misses = {}  # (guild ID, query) -> monotonic expiry
+
+    def build(self, guild):
+        index = GuildMembers()
+        for member in guild.members:
+            index.add(member)
+        self.guilds[guild.id] = index
+        return index
+
+    def add(self, member):
+        index = self.guilds.get(member.guild.id) or self.build(member.guild)
+        index.add(member)
+        self.forget_misses(member.guild.id)
+
+    def forget_misses(self, guild_id):
+        for key in [key for key in self.misses if key[0] == guild_id]:
+            del self.misses[key]
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        for guild in self.bot.guilds:
+            self.build(guild)
+        print(f"[MemberIndex] Indexed {sum(len(index.by_id) for index in self.guilds.values())} members "
+              f"in {len(self.guilds)} servers.")
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.build(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.guilds.pop(guild.id, None)
+        self.forget_misses(guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.add(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        index = self.guilds.get(member.guild.id)
+        if index:
+            index.discard(member.id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if member_keys(before) != member_keys(after):
+            self.add(after)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        """Usernames and global names are per user, so re-index them in every guild."""
+        if member_keys(before) == member_keys(after):
+            return
+        for guild_id, index in self.guilds.items():
+            if after.id in index.by_id:
+                member = self.bot.get_guild(guild_id).get_member(after.id)
+                if member:
+                    self.add(member)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if isinstance(message.author, discord.Member):
+            index = self.guilds.get(message.guild.id)
+            if index is None or message.author.id not in index.by_id:
+                self.add(message.author)
+
+    async def resolve(self, guild, identifier):
+        """Resolves a mention, user ID or name to a member (or, for mentions and IDs, a user)."""
+        index = self.guilds.get(guild.id) or self.build(guild)
+        now = time.monotonic()
+        miss = (guild.id, identifier)
+        if self.misses.get(miss, 0) > now:
+            return None
+
+        match = MENTION.fullmatch(identifier)
+        user_id = int(match.group(1)) if match else int(identifier) if identifier.isdigit() else None
+        if user_id:
+            found = index.by_id.get(user_id) or guild.get_member(user_id) or self.bot.get_user(user_id)
+            if found is None:
+                try:
+                    found = await self.bot.fetch_user(user_id)  # Mentioned users who have left still have history
+                except discord.NotFound:
+                    found = None
+        else:
+            found = index.lookup(identifier)
+
+        if found is None:
+            if len(self.misses) > 1000:
+                self.misses = {key: expiry for key, expiry in self.misses.items() if expiry > now}
+            self.misses[miss] = now + MISS_TTL
+        return found
+
+
+async def setup(bot):
+    await bot.add_cog(MemberIndex(bot))
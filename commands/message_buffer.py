@@ -0,0 +1,172 @@
+from collections import OrderedDict, deque
+
+import discord
+from discord.ext import commands
+
+PER_CHANNEL = 100  # Most recent messages kept per channel
+MAX_RECORDS = 20_000  # Hard cap across all channels; the least recently active channels go first
+MAX_CONTENT_CHARS = 2000  # Longer (Nitro) messages are cut to keep records small
+
+
+class MessageRecord:
+    """The parts of a message the bot's commands read."""
+
+    __slots__ = ("id", "author_id", "author_name", "author_bot", "content", "created_at")
+
+    def __init__(self, id, author_id, author_name, author_bot, content, created_at):
+        self.id = id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.author_bot = author_bot
+        self.content = content
+        self.created_at = created_at  # POSIX timestamp
+
+    @classmethod
+    def from_message(cls, message):
+        return cls(
+            message.id, message.author.id, message.author.display_name, message.author.bot,
+            message.content[:MAX_CONTENT_CHARS], message.created_at.timestamp(),
+        )
+
+
+class ChannelBuffer:
+    """Ring buffer of one channel's newest messages, oldest first."""
+
+    __slots__ = ("records", "complete")
+
+    def __init__(self):
+        self.records = deque(maxlen=PER_CHANNEL)
+        # True once seeded from history: the buffer then holds every recent
+        # message, not just those seen since startup
+        self.complete = False
+
+    def find(self, message_id):
+        for record in reversed(self.records):
+            if record.id == message_id:
+                return record
+        return None
+
+
+class MessageBuffer(commands.Cog):
+    """Keeps each channel's recent messages in memory so commands can read them without REST calls.
+
+    Buffers are filled from message events. The first read of a channel the
+    bot hasn't seen since startup seeds its buffer from history once; after
+    that, reads of up to PER_CHANNEL messages are served from memory.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.channels = OrderedDict()  # channel ID -> ChannelBuffer, least recently active first
+        self.size = 0  # Records across all buffers
+
+    def buffer_for(self, channel_id):
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            buffer = self.channels[channel_id] = ChannelBuffer()
+        self.channels.move_to_end(channel_id)
+        return buffer
+
+    def add(self, channel_id, record):
+        buffer = self.buffer_for(channel_id)
+        if buffer.find(record.id):
+            return
+        if len(buffer.records) == PER_CHANNEL:
+            self.size -= 1  # The deque drops its oldest record
+        buffer.records.append(record)
+        self.size += 1
+        self.enforce_cap()
+
+    def enforce_cap(self):
+        while self.size > MAX_RECORDS:
+            _, evicted = self.channels.popitem(last=False)
+            self.size -= len(evicted.records)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        self.add(message.channel.id, MessageRecord.from_message(message))
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        buffer = self.channels.get(payload.channel_id)
+        record = buffer.find(payload.message_id) if buffer else None
+        if record is not None:
+            record.content = payload.message.content[:MAX_CONTENT_CHARS]
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.discard(payload.channel_id, {payload.message_id})
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        self.discard(payload.channel_id, payload.message_ids)
+
+    def discard(self, channel_id, message_ids):
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            return
+        kept = [record for record in buffer.records if record.id not in message_ids]
+        if len(kept) == len(buffer.records):
+            return
+        if len(buffer.records) == PER_CHANNEL:
+            buffer.complete = False  # An older message we never saw now belongs in the window
+        self.size -= len(buffer.records) - len(kept)
+        buffer.records = deque(kept, maxlen=PER_CHANNEL)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """After a fresh connection, events may have been missed, so reseed buffers on their next read."""
+        for buffer in self.channels.values():
+            buffer.complete = False
+
+    async def recent(self, channel, limit, before=None):
+        """Returns up to `limit` of a channel's newest messages (before message ID `before`), newest first."""
+        if limit > PER_CHANNEL:
+            return await fetch_history(channel, limit, before)
+        buffer = self.buffer_for(channel.id)
+        records = newest(buffer, limit, before)
+        if len(records) >= limit or buffer.complete:
+            return records
+
+        history = await fetch_history(channel, PER_CHANNEL)
+        buffer = self.buffer_for(channel.id)  # May have been evicted while we waited
+        merged = {record.id: record for record in history}
+        merged.update((record.id, record) for record in buffer.records)  # Events are fresher than history
+        seeded = sorted(merged.values(), key=lambda record: record.id)[-PER_CHANNEL:]
+        self.size += len(seeded) - len(buffer.records)
+        buffer.records = deque(seeded, maxlen=PER_CHANNEL)
+        buffer.complete = True
+        self.enforce_cap()
+        return newest(buffer, limit, before)
+
+
+def newest(buffer, limit, before=None):
+    records = []
+    for record in reversed(buffer.records):
+        if before is None or record.id < before:
+            records.append(record)
+            if len(records) == limit:
+                break
+    return records
+
+
+async def fetch_history(channel, limit, before=None):
+    """Reads messages over REST as records, newest first."""
+    before = discord.Object(id=before) if before else None
+    return [MessageRecord.from_message(message) async for message in channel.history(limit=limit, before=before)]
+
+
+async def recent_messages(bot, channel, limit, before=None):
+    """Returns a channel's newest messages as MessageRecords, newest first.
+
+    Served from the MessageBuffer cog when it is loaded, otherwise read over REST.
+    Pass `before=ctx.message.id` to skip the command message and anything after it.
+    """
+    message_buffer = bot.get_cog("MessageBuffer")
+    if message_buffer is None:
+        return await fetch_history(channel, limit, before)
+    return await message_buffer.recent(channel, limit, before)
+
+
+async def setup(bot):
+    await bot.add_cog(MessageBuffer(bot))
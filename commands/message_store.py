@@ -0,0 +1,324 @@
+import asyncio
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+import discord
+from discord.ext import commands, tasks
+from commands.message_buffer import MessageRecord
+
+MESSAGE_DB_PATH = os.getenv("MESSAGE_DB_PATH", "messages.db")
+RETENTION_DAYS = float(os.getenv("MESSAGE_RETENTION_DAYS", "30"))  # Older messages are deleted on compaction
+BACKFILL_LIMIT = 2000  # Most messages read per channel when catching up after startup or a reconnect
+COMPACT_EVERY = 3600  # Seconds between retention and compaction passes
+UNREADABLE_RETRY = 3600  # Seconds before a channel the bot couldn't read is tried again
+COLUMNS = "id, author_id, author_name, author_bot, content, ts"  # MessageRecord's fields, in order
+
+
+def retention_cutoff():
+    return time.time() - RETENTION_DAYS * 86400
+
+
+def as_datetime(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+class MessageStore(commands.Cog):
+    """Keeps the messages of whitelisted channels in a local SQLite file.
+
+    Every channel named in any `processing_whitelist` is stored. Messages are
+    written from gateway events in batches, and after startup or a reconnect
+    each channel is backfilled from history, so time-range and per-author
+    queries are answered locally. Per channel, the store records the time from
+    which it is known to be complete; reads outside that range, or of
+    channels still backfilling, return None so callers fall back to the API.
+    Channels the bot can't read are skipped, and left out of multi-channel
+    coverage checks, until UNREADABLE_RETRY has passed.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = None
+        self.db_lock = threading.Lock()  # Writes and queries run in worker threads
+        self.pending = []  # Rows not yet written to disk
+        self.deleted = []  # Message IDs to delete on the next flush
+        self.coverage = {}  # channel ID -> POSIX time the store is complete from (kept current channels only)
+        self.backfills = {}  # channel ID -> running backfill task
+        self.unreadable = {}  # channel ID -> monotonic time to try reading it again
+        # channel ID -> first message ID received live while the channel wasn't covered.
+        # Stored messages older than it predate the gap a backfill has to close.
+        self.first_live = {}
+        self.tracked_cache = {}  # guild ID -> (config snapshot, frozenset of channel IDs)
+        self.last_compacted = 0.0
+
+    async def cog_load(self):
+        await asyncio.to_thread(self.open_db)
+        self.flush_messages.start()
+
+    async def cog_unload(self):
+        self.flush_messages.cancel()
+        for task in list(self.backfills.values()):
+            task.cancel()
+        await asyncio.to_thread(self.write_pending)
+        if self.db:
+            self.db.close()
+
+    def open_db(self):
+        self.db = sqlite3.connect(MESSAGE_DB_PATH, check_same_thread=False)
+        self.db.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Only takes effect on a new file
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                guild_id INTEGER,
+                channel_id INTEGER NOT NULL,
+                author_id INTEGER NOT NULL,
+                author_name TEXT,
+                author_bot INTEGER NOT NULL DEFAULT 0,
+                content TEXT NOT NULL DEFAULT '',
+                ts REAL NOT NULL
+            )"""
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS messages_channel_ts ON messages (channel_id, ts)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS messages_author_ts ON messages (author_id, ts)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS channel_coverage (channel_id INTEGER PRIMARY KEY, covered_from REAL NOT NULL)"
+        )
+        self.db.commit()
+        count = self.db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        print(f"[MessageStore] Opened {MESSAGE_DB_PATH} with {count} messages.")
+
+    def tracked(self, guild_id):
+        """Returns the IDs of a guild's stored channels (every whitelisted channel)."""
+        config_manager = self.bot.get_cog("ConfigManager")
+        if config_manager is None or guild_id is None:
+            return frozenset()
+        snapshot = config_manager.get_snapshot(guild_id)
+        cached = self.tracked_cache.get(guild_id)
+        if cached is None or cached[0] is not snapshot:
+            cached = self.tracked_cache[guild_id] = (snapshot, frozenset().union(*snapshot.whitelists.values()))
+        return cached[1]
+
+    @staticmethod
+    def row(message):
+        record = MessageRecord.from_message(message)
+        return (record.id, message.guild.id, message.channel.id, record.author_id, record.author_name,
+                int(record.author_bot), record.content, record.created_at)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.guild and message.channel.id in self.tracked(message.guild.id):
+            self.pending.append(self.row(message))
+            if message.channel.id not in self.coverage:
+                self.first_live.setdefault(message.channel.id, message.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        if payload.channel_id in self.tracked(payload.guild_id):
+            self.pending.append(self.row(payload.message))  # Replaces the stored row
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        if payload.channel_id in self.tracked(payload.guild_id):
+            self.deleted.append(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        if payload.channel_id in self.tracked(payload.guild_id):
+            self.deleted.extend(payload.message_ids)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Events may have been missed while disconnected, so every channel is backfilled again."""
+        self.coverage.clear()
+        self.first_live.clear()
+
+    @tasks.loop(seconds=30)
+    async def flush_messages(self):
+        """Writes buffered messages, starts backfills for channels that need one, and compacts hourly."""
+        await asyncio.to_thread(self.write_pending)
+        if not self.bot.is_ready():
+            return
+
+        channel_index = self.bot.get_cog("ChannelIndex")
+        tracked = set()
+        for guild in self.bot.guilds:
+            for channel_id in self.tracked(guild.id):
+                tracked.add(channel_id)
+                if channel_id in self.coverage or channel_id in self.backfills \
+                        or self.unreadable.get(channel_id, 0) > time.monotonic():
+                    continue
+                channel = channel_index.get(guild.id, channel_id) if channel_index else guild.get_channel(channel_id)
+                if channel is not None:
+                    self.backfills[channel_id] = asyncio.create_task(self.backfill(channel))
+        for channel_id in set(self.coverage) - tracked:
+            del self.coverage[channel_id]  # No longer whitelisted, so no longer kept current
+        for channel_id in set(self.unreadable) - tracked:
+            del self.unreadable[channel_id]
+
+        if time.time() - self.last_compacted > COMPACT_EVERY:
+            self.last_compacted = time.time()
+            await asyncio.to_thread(self.compact)
+
+    async def backfill(self, channel):
+        """Stores what a channel received since its newest stored message from before the gap.
+
+        Reads newest first, up to BACKFILL_LIMIT. Messages that arrived live
+        since the gap opened are already stored, so the gap starts at the newest
+        stored message older than the first of them.
+        """
+        try:
+            permissions = channel.permissions_for(channel.guild.me)
+            if not (permissions.read_messages and permissions.read_message_history):
+                self.mark_unreadable(channel)  # Skip the request that would fail
+                return
+            cutoff = retention_cutoff()
+            gap_opened = self.first_live.get(channel.id, 2 ** 63 - 1)
+            (newest_id, newest_ts, covered_from), = await asyncio.to_thread(
+                self.query,
+                "SELECT MAX(id), MAX(ts), (SELECT covered_from FROM channel_coverage WHERE channel_id = ?) "
+                "FROM messages WHERE channel_id = ? AND id < ?",
+                (channel.id, channel.id, gap_opened),
+            )
+            after = discord.Object(id=newest_id) if newest_id else as_datetime(cutoff)
+            rows = [self.row(message)
+                    async for message in channel.history(limit=BACKFILL_LIMIT, after=after, oldest_first=False)]
+            self.pending.extend(rows)
+
+            if len(rows) == BACKFILL_LIMIT:
+                covered_from = rows[-1][-1]  # The gap was bigger than one backfill; only trust what was read
+            elif not newest_id:
+                covered_from = cutoff
+            elif covered_from is None:
+                covered_from = newest_ts  # Stored rows from before an unknown gap aren't trusted
+            await asyncio.to_thread(self.write_pending, (channel.id, covered_from))
+            self.coverage[channel.id] = covered_from
+            self.first_live.pop(channel.id, None)
+            self.unreadable.pop(channel.id, None)
+            print(f"[MessageStore] Backfilled {len(rows)} messages in #{channel.name}.")
+        except discord.Forbidden:
+            self.mark_unreadable(channel)
+        except discord.HTTPException as e:
+            print(f"[MessageStore] Backfill of #{channel.name} failed: {e}")  # Retried on the next flush
+        finally:
+            self.backfills.pop(channel.id, None)
+
+    def mark_unreadable(self, channel):
+        if channel.id not in self.unreadable:
+            print(f"[MessageStore] Can't read #{channel.name}; retrying every {UNREADABLE_RETRY}s.")
+        self.unreadable[channel.id] = time.monotonic() + UNREADABLE_RETRY
+
+    def write_pending(self, coverage=None):
+        rows, self.pending = self.pending, []
+        deleted, self.deleted = self.deleted, []
+        if (rows or deleted or coverage) and self.db:
+            with self.db_lock, self.db:
+                self.db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.db.executemany("DELETE FROM messages WHERE id = ?", [(message_id,) for message_id in deleted])
+                if coverage:
+                    self.db.execute("INSERT OR REPLACE INTO channel_coverage VALUES (?, ?)", coverage)
+
+    def compact(self):
+        """Deletes messages past the retention period and returns the freed space to the filesystem."""
+        with self.db_lock:
+            with self.db:
+                removed = self.db.execute("DELETE FROM messages WHERE ts < ?", (retention_cutoff(),)).rowcount
+            self.db.execute("PRAGMA incremental_vacuum")
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if removed:
+            print(f"[MessageStore] Removed {removed} messages older than {RETENTION_DAYS:g} days.")
+
+    def query(self, sql, params):
+        with self.db_lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def covers(self, channel_id, since=None):
+        """True if the store has every message in the channel after `since` (default: its whole range)."""
+        if channel_id not in self.coverage:
+            return False
+        return since is None or since >= max(self.coverage[channel_id], retention_cutoff())
+
+    async def select(self, sql, params):
+        await asyncio.to_thread(self.write_pending)
+        return [MessageRecord(*row) for row in await asyncio.to_thread(self.query, sql, params)]
+
+    async def messages_since(self, channel_id, since, limit):
+        """Returns up to `limit` of a channel's newest messages after `since` (POSIX time), newest first.
+
+        Returns None if the store doesn't cover that range.
+        """
+        if not self.covers(channel_id, since):
+            return None
+        return await self.select(
+            f"SELECT {COLUMNS} FROM messages WHERE channel_id = ? AND ts > ? ORDER BY ts DESC LIMIT ?",
+            (channel_id, since, limit),
+        )
+
+    async def author_messages(self, channel_id, author_id, limit):
+        """Returns up to `limit` of an author's newest stored text messages in a channel, newest first.
+
+        Returns None if the channel isn't stored yet.
+        """
+        if not self.covers(channel_id):
+            return None
+        return await self.select(
+            f"SELECT {COLUMNS} FROM messages WHERE author_id = ? AND channel_id = ? AND TRIM(content) != '' "
+            "ORDER BY ts DESC LIMIT ?",
+            (author_id, channel_id, limit),
+        )
+
+    async def author_history(self, author_id, channel_ids, limit):
+        """Returns up to `limit` of an author's newest text messages across channels as (channel ID, record), newest first.
+
+        Returns None unless every channel the bot can read is stored.
+        """
+        channel_ids = [channel_id for channel_id in channel_ids if channel_id not in self.unreadable]
+        if not channel_ids or not all(self.covers(channel_id) for channel_id in channel_ids):
+            return None
+        await asyncio.to_thread(self.write_pending)
+        placeholders = ", ".join("?" * len(channel_ids))
+        rows = await asyncio.to_thread(
+            self.query,
+            f"SELECT channel_id, {COLUMNS} FROM messages WHERE author_id = ? AND channel_id IN ({placeholders}) "
+            "AND TRIM(content) != '' ORDER BY ts DESC LIMIT ?",
+            (author_id, *channel_ids, limit),
+        )
+        return [(row[0], MessageRecord(*row[1:])) for row in rows]
+
+
+async def messages_since(bot, channel, since, limit):
+    """Returns up to `limit` of a channel's newest messages after `since` (a POSIX time), newest first.
+
+    Served from the MessageStore when it covers the range, otherwise read over REST.
+    """
+    message_store = bot.get_cog("MessageStore")
+    records = await message_store.messages_since(channel.id, since, limit) if message_store else None
+    if records is None:
+        records = [MessageRecord.from_message(message)
+                   async for message in channel.history(limit=limit, after=as_datetime(since), oldest_first=False)]
+    return records
+
+
+async def author_messages(bot, channel, author_id, limit, scan=100):
+    """Returns up to `limit` of an author's newest text messages in a channel, newest first.
+
+    Served from the MessageStore when the channel is stored, otherwise found
+    by reading the channel's last `scan` messages over REST.
+    """
+    message_store = bot.get_cog("MessageStore")
+    records = await message_store.author_messages(channel.id, author_id, limit) if message_store else None
+    if records is None:
+        records = []
+        async for message in channel.history(limit=scan):
+            if message.author.id == author_id and message.content.strip():
+                records.append(MessageRecord.from_message(message))
+                if len(records) >= limit:
+                    break
+    return records
+
+
+async def setup(bot):
+    await bot.add_cog(MessageStore(bot))
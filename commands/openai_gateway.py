@@ -0,0 +1,422 @@
+import asyncio
+import datetime
+import os
+import time
+from collections.abc import Mapping
+
+import httpx
+import discord
+import openai
+from discord.ext import commands
+from commands.llm.cache import DEFAULT_CACHE_TTLS, ResponseCache, cache_key
+from commands.llm.cassette import CassetteTransport
+from commands.llm.concurrency import AIMDController
+from commands.llm.context import get_encoding
+from commands.llm.credentials import CredentialPool
+from commands.llm.prompts import prompt_id
+from commands.llm.retry import CircuitBreaker, RetryPolicy
+from commands.llm.routing import DEFAULT_TIER, DEFAULT_TIERS, ModelRouter
+from commands.llm.scheduler import FairScheduler
+
+DEFAULT_CHAT_MODEL = "gpt-3.5-turbo"  # Only used to pick a tokenizer; calls are routed by tier
+
+# Scheduler lane for each command; anything not listed runs in "standard"
+COMMAND_LANES = {
+    "chat": "interactive",
+    "user_chat": "interactive",
+    "egg": "interactive",
+    "dream": "interactive",
+    "talkto": "interactive",
+    "catchup": "digest",
+    "guide": "digest",
+}
+
+
+class StreamInterrupted(Exception):
+    """Raised when a streamed completion fails after text was already delivered."""
+
+
+class OpenAIGateway(commands.Cog):
+    """Bot-wide async OpenAI client shared by every cog.
+
+    Owns one pooled, keep-alive HTTP connection set so no cog ever makes a
+    blocking network call on the event loop.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120),
+        )
+        # OPENAI_CASSETTE_MODE=record|replay swaps the network for on-disk recordings (see llm/cassette.py)
+        transport = CassetteTransport.from_env(transport)
+        self.http_client = openai.DefaultAsyncHttpxClient(transport=transport, timeout=httpx.Timeout(120.0, connect=10.0))
+        # Every key gets its own client, but they all share the one connection pool
+        keys = None
+        self.replaying = isinstance(transport, CassetteTransport) and transport.mode == "replay"
+        if self.replaying and not (os.getenv("OPENAI_API_KEYS") or os.getenv("OPENAI_API_KEY")):
+            keys = [("replay", None)]  # Replays never reach OpenAI, so no real key is needed
+        self.credentials = CredentialPool(self.http_client, keys)
+        # In-flight limits start low and are tuned by AIMD from observed 429s and latency
+        self.controllers = {
+            "chat": AIMDController(initial=4, maximum=32, on_change=lambda limit: self.scheduler.set_limit("chat", limit)),
+            "images": AIMDController(initial=2, maximum=8, on_change=lambda limit: self.scheduler.set_limit("images", limit)),
+        }
+        self.scheduler = FairScheduler({endpoint: c.limit for endpoint, c in self.controllers.items()})
+        self.retry_policy = RetryPolicy()
+        self.breakers = {endpoint: CircuitBreaker(endpoint) for endpoint in self.controllers}
+        self.cache = ResponseCache()
+        self.router = ModelRouter()
+        self.warmup_task = None
+
+    async def cog_load(self):
+        """Warms up the connection pool and tokenizer in the background when the cog is loaded."""
+        self.warmup_task = asyncio.create_task(self.warm_up())
+
+    async def cog_unload(self):
+        """Closes the shared connection pool."""
+        if self.warmup_task:
+            self.warmup_task.cancel()
+        await self.http_client.aclose()
+
+    async def warm_up(self):
+        """Loads the tokenizer and opens a keep-alive connection so the first command skips both."""
+        await asyncio.to_thread(get_encoding, DEFAULT_CHAT_MODEL)  # May download on first run
+        if self.replaying:
+            return  # Nothing to connect to
+        try:
+            await self.credentials.credentials[0].client.models.list()
+            print("[OpenAIGateway] Connection pool warmed up.")
+        except Exception as e:
+            print(f"[OpenAIGateway] Warm-up failed: {e}")
+
+    async def chat(self, messages, model=None, command=None, user_id=None, guild_id=None, stage=None, **kwargs):
+        """Runs a chat completion and returns the reply text.
+
+        `command`, `user_id` and `guild_id` decide the scheduler lane and fair-share bucket.
+        Unless `model` is given, the model comes from the tier routed for `command` and `stage`.
+        Raises BudgetExceeded (from commands/usage.py) if the caller is over budget.
+        """
+        routed = model is None
+        model = model or self.model_for(command, stage, guild_id)
+        ttl = self.cache_ttl(command, guild_id)
+        if ttl:
+            key = cache_key(command, model, messages, **kwargs)
+            cached = self.cache.get(key, command)
+            if cached is not None:
+                return cached
+
+        if self.check_budget(command, user_id, guild_id) and routed:
+            model = self.router.route("fast")  # Nearly out of budget: finish on the cheapest tier
+            key = cache_key(command, model, messages, **kwargs)
+        started = time.monotonic()
+        response = await self._call(
+            "chat", command, user_id, guild_id,
+            lambda client: client.chat.completions.with_raw_response.create(model=model, messages=messages, **kwargs),
+            model=model,
+        )
+        self.record_usage(command, user_id, guild_id, model, response.usage, latency=time.monotonic() - started,
+                          prompt=prompt_id(messages))
+        reply = response.choices[0].message.content
+        if ttl and reply:
+            self.cache.set(key, reply, ttl)
+        return reply
+
+    async def chat_stream(self, messages, model=None, command=None, user_id=None, guild_id=None, stage=None, **kwargs):
+        """Streams a chat completion, yielding text deltas as they arrive.
+
+        The call holds its scheduler slot until the stream ends. Retries only
+        happen before the first token; a stream that breaks midway raises
+        StreamInterrupted instead of replaying text the caller already showed.
+        A cached reply is yielded in one piece.
+        """
+        routed = model is None
+        model = model or self.model_for(command, stage, guild_id, streaming=True)
+        ttl = self.cache_ttl(command, guild_id)
+        if ttl:
+            key = cache_key(command, model, messages, **kwargs)
+            cached = self.cache.get(key, command)
+            if cached is not None:
+                yield cached
+                return
+
+        if self.check_budget(command, user_id, guild_id) and routed:
+            model = self.router.route("fast", streaming=True)  # Nearly out of budget: finish on the cheapest tier
+            key = cache_key(command, model, messages, **kwargs)
+        deltas = asyncio.Queue()
+        finished = object()
+        usage = []  # The final chunk carries token counts for the whole stream
+
+        async def pump(stream):
+            started = False
+            try:
+                async for chunk in stream:
+                    if chunk.usage:
+                        usage.append(chunk.usage)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        started = True
+                        deltas.put_nowait(delta)
+            except (openai.APIError, httpx.HTTPError) as e:
+                if started:
+                    raise StreamInterrupted(str(e)) from e
+                raise
+
+        async def run():
+            try:
+                await self._call(
+                    "chat", command, user_id, guild_id,
+                    lambda client: client.chat.completions.with_raw_response.create(
+                        model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs
+                    ),
+                    consume=pump,
+                    model=model,
+                )
+            finally:
+                deltas.put_nowait(finished)
+
+        started = time.monotonic()
+        task = asyncio.create_task(run())
+        received = []
+        try:
+            while (delta := await deltas.get()) is not finished:
+                received.append(delta)
+                yield delta
+            await task  # Surfaces any error from the request
+        finally:
+            task.cancel()
+            if usage:
+                self.record_usage(command, user_id, guild_id, model, usage[-1], latency=time.monotonic() - started,
+                                  prompt=prompt_id(messages))
+        if ttl and received:
+            self.cache.set(key, "".join(received), ttl)
+
+    async def image(self, prompt, size="1024x1024", command=None, user_id=None, guild_id=None):
+        """Generates a single image and returns its URL."""
+        ttl = self.cache_ttl(command, guild_id)
+        if ttl:
+            key = cache_key(command, "images", [{"role": "user", "content": prompt}], size=size)
+            cached = self.cache.get(key, command)
+            if cached is not None:
+                return cached
+
+        self.check_budget(command, user_id, guild_id)
+        started = time.monotonic()
+        response = await self._call(
+            "images", command, user_id, guild_id,
+            lambda client: client.images.with_raw_response.generate(prompt=prompt, n=1, size=size)
+        )
+        self.record_usage(command, user_id, guild_id, "dall-e-2", images=1, size=size, latency=time.monotonic() - started)
+        url = response.data[0].url
+        if ttl and url:
+            self.cache.set(key, url, ttl)
+        return url
+
+    def model_for(self, command, stage=None, guild_id=None, streaming=False):
+        """Returns the chat model for a command (or one stage of it) from its configured tier.
+
+        `model_tier` in the command's entry in the guild's #bot-config sets the tier, `model_tiers`
+        maps individual stages, and `fallback_latency_seconds` sets how slow the
+        tier may get (time to first token if `streaming`) before calls move to a faster one.
+        """
+        tier = DEFAULT_TIERS.get(f"{command}.{stage}") or DEFAULT_TIERS.get(command, DEFAULT_TIER)
+        latency_limit = None
+        config_manager = self.bot.get_cog("ConfigManager") if self.bot else None
+        if config_manager:
+            stage_tiers = config_manager.get_command_setting(command, "model_tiers", guild_id=guild_id)
+            if isinstance(stage_tiers, Mapping) and stage in stage_tiers:
+                tier = stage_tiers[stage]
+            else:
+                tier = config_manager.get_command_setting(command, "model_tier", tier, guild_id)
+            configured = config_manager.get_command_setting(command, "fallback_latency_seconds", guild_id=guild_id)
+            if isinstance(configured, (int, float)) and configured > 0:
+                latency_limit = configured
+        return self.router.route(tier, latency_limit, streaming)
+
+    def check_budget(self, command, user_id, guild_id):
+        """Raises BudgetExceeded if a spend budget is used up; True means it is nearly used up."""
+        ledger = self.bot.get_cog("UsageLedger") if self.bot else None
+        return ledger.check(command, user_id, guild_id) if ledger else False
+
+    def record_usage(self, command, user_id, guild_id, model, usage=None, images=0, size=None, latency=None, prompt=None):
+        """Books a completed call's tokens (or images), latency, cost and prompt template in the usage ledger."""
+        ledger = self.bot.get_cog("UsageLedger") if self.bot else None
+        if ledger:
+            ledger.record(
+                command, user_id, guild_id, model,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                images=images, size=size, latency=latency, prompt=prompt,
+            )
+
+    def cache_ttl(self, command, guild_id=None):
+        """Returns how long to cache `command`'s responses, or None if they shouldn't be.
+
+        `cache: false` in the command's entry in the guild's #bot-config opts out, and
+        `cache_ttl_seconds` overrides the built-in TTL.
+        """
+        ttl = DEFAULT_CACHE_TTLS.get(command)
+        config_manager = self.bot.get_cog("ConfigManager") if self.bot else None
+        if config_manager:
+            if config_manager.get_command_setting(command, "cache", guild_id=guild_id) is False:
+                return None
+            configured = config_manager.get_command_setting(command, "cache_ttl_seconds", guild_id=guild_id)
+            if isinstance(configured, (int, float)) and configured >= 0:
+                ttl = configured
+        return ttl or None
+
+    async def _call(self, endpoint, command, user_id, guild_id, request, consume=None, model=None):
+        """Runs `request(client)` under the shared retry policy and the endpoint's circuit breaker.
+
+        Backoff sleeps happen outside the scheduler slot, so a waiting retry
+        never blocks anyone else's call. `consume(response)`, if given, runs
+        inside the slot (used to read streamed responses). Response times, or
+        times to first token for streams, are reported to the model router under `model`.
+        """
+        lane = COMMAND_LANES.get(command, "standard")
+        breaker = self.breakers[endpoint]
+        for attempt in range(self.retry_policy.max_attempts):
+            breaker.before_call()
+            try:
+                response = await self._attempt(endpoint, lane, user_id, guild_id, request, consume, model)
+            except BaseException as e:
+                retryable = isinstance(e, Exception) and self.retry_policy.is_retryable(e)
+                if retryable and not isinstance(e, openai.RateLimitError):
+                    breaker.record_failure()
+                else:
+                    # Cancelled, rejected (4xx) or rate limited: no verdict on upstream health.
+                    # Rate limits are handled by key cooldowns, not the breaker.
+                    breaker.release_probe()
+                if not retryable or attempt + 1 >= self.retry_policy.max_attempts or breaker.state == "open":
+                    raise
+                delay = max(self.retry_policy.delay(attempt, e), self.credentials.next_ready_in())
+                print(f"[OpenAIGateway] {endpoint} call failed ({type(e).__name__}); retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            return response
+
+    async def _attempt(self, endpoint, lane, user_id, guild_id, request, consume=None, model=None):
+        """Makes one attempt inside a scheduler slot on the key with the most headroom.
+
+        A key that answers 429 is throttled and the call moves to the next ready
+        key; a key that answers 401 is dropped from rotation for good.
+        """
+        controller = self.controllers[endpoint]
+        async with self.scheduler.slot(endpoint, lane, user_id, guild_id):
+            for attempt in range(len(self.credentials.credentials)):
+                credential = self.credentials.acquire()
+                started = time.monotonic()
+                try:
+                    raw = await request(credential.client)
+                    # Time to headers: the whole response for plain calls, the first token for streams.
+                    # Stream reading time depends on reply length, so it isn't reported as latency.
+                    latency = time.monotonic() - started
+                    if model:
+                        self.router.record(model, latency, streaming=consume is not None)
+                    response = raw.parse()
+                    if consume is not None:
+                        await consume(response)
+                except openai.RateLimitError as e:
+                    self.credentials.release(credential)
+                    self.credentials.throttle(credential, e.response.headers, quota_exhausted=e.code == "insufficient_quota")
+                    if not self.credentials.has_ready():
+                        controller.record_rate_limited()  # Only a pool-wide 429 should shrink concurrency
+                        raise
+                    continue
+                except openai.AuthenticationError:
+                    self.credentials.release(credential)
+                    self.credentials.revoke(credential)
+                    if not self.credentials.has_ready():
+                        raise
+                    continue
+                except (openai.APIStatusError, openai.APIConnectionError):
+                    self.credentials.release(credential)
+                    controller.record_error()
+                    raise
+                except BaseException:
+                    self.credentials.release(credential)
+                    raise
+
+                self.credentials.release(credential, raw.headers)
+                controller.record_success(latency)
+                return response
+
+        raise RuntimeError("No OpenAI API key is currently available.")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def llmstatus(self, ctx):
+        """Shows the live LLM concurrency limits and recent controller decisions.
+
+        Usage:
+        `!llmstatus` → DMs the current in-flight limit, queue depth and latest AIMD decisions per endpoint,
+        plus response cache hit rates and per-key rate-limit state.
+
+        - **Server Mode Only**: Requires administrator permissions.
+        """
+        lines = ["📊 **LLM Gateway Status**"]
+        for endpoint, controller in self.controllers.items():
+            state = controller.snapshot()
+            baseline = f"{state['baseline_latency']:.2f}s" if state["baseline_latency"] is not None else "n/a"
+            lines.append(
+                f"\n**{endpoint}** — limit `{state['limit']}`, in flight `{self.scheduler.in_flight[endpoint]}`, "
+                f"queued `{self.scheduler.queued(endpoint)}`, baseline latency `{baseline}`, "
+                f"circuit `{self.breakers[endpoint].state}`\n"
+                f"ok `{state['totals']['ok']}` · 429 `{state['totals']['rate_limited']}` · "
+                f"errors `{state['totals']['errors']}` · spikes `{state['totals']['spikes']}`"
+            )
+            for timestamp, old, new, reason in state["decisions"][-5:]:
+                when = datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
+                lines.append(f"• `{when}` {old} → {new}: {reason}")
+
+        cache = self.cache.snapshot()
+        lines.append(
+            f"\n**Response cache** — `{cache['entries']}` entries, `{cache['bytes'] / 1024:.0f}` KiB, "
+            f"evictions `{cache['evictions']}`"
+        )
+        for command, (hits, misses) in cache["per_command"].items():
+            rate = hits / (hits + misses) if hits + misses else 0
+            lines.append(f"• `{command}` hits `{hits}` · misses `{misses}` ({rate:.0%})")
+
+        lines.append(f"\n**Model tiers** — fallbacks `{self.router.fallbacks}`")
+        for tier in self.router.snapshot():
+            latency = f"{tier['latency']:.1f}s" if tier["latency"] is not None else "n/a"
+            first_token = f"{tier['first_token']:.1f}s" if tier["first_token"] is not None else "n/a"
+            degraded_for = max(tier["degraded_for"], tier["streams_degraded_for"])
+            status = f"⏬ falling back for {degraded_for:.0f}s" if degraded_for else "✅"
+            lines.append(f"• `{tier['tier']}` → `{tier['model']}` {status} — avg latency `{latency}`, "
+                         f"first token `{first_token}`")
+
+        lines.append("\n**API keys**")
+        for key in self.credentials.snapshot():
+            if key["revoked"]:
+                status = "❌ revoked"
+            elif key["cooling_for"]:
+                status = f"⏸️ throttled for {key['cooling_for']:.0f}s"
+            else:
+                status = f"✅ headroom {key['headroom']:.0%}"
+            lines.append(
+                f"• `{key['label']}` {status} — remaining requests `{key['remaining_requests']}`, "
+                f"tokens `{key['remaining_tokens']}`, in flight `{key['in_flight']}`"
+            )
+
+        try:
+            await ctx.author.send("\n".join(lines))
+        except discord.Forbidden:
+            await ctx.send("⚠️ I couldn't send you a DM. Please check your privacy settings.")
+
+
+def get_gateway(bot):
+    """Returns the loaded OpenAIGateway cog, or raises if it is unavailable."""
+    gateway = bot.get_cog("OpenAIGateway")
+    if gateway is None:
+        raise RuntimeError("OpenAI gateway is not loaded.")
+    return gateway
+
+
+async def setup(bot):
+    await bot.add_cog(OpenAIGateway(bot))
+    command = bot.get_command("llmstatus")
+    if command:
+        command.command_mode = "server"
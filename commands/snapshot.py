@@ -1,16 +1,15 @@
 import discord
 from discord.ext import commands
-import openai
-import os
-import asyncio
+from commands.admission import send_status
+from commands.llm.prompts import render_prompt
+from commands.message_buffer import recent_messages
+from commands.openai_gateway import get_gateway
 
 class Snapshot(commands.Cog):
     """Cog for generating an AI image based on recent messages."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.lock = asyncio.Lock()  # Prevents multiple API calls at once
 
     async def fetch_recent_messages(self, ctx):
         """Fetch the last 10 messages from either the current channel or DM history."""
@@ -19,55 +18,40 @@ class Snapshot(commands.Cog):
 
         if is_dm:
             # Fetch last 10 messages in the DM history between the user and bot
-            async for message in ctx.channel.history(limit=20):
-                if message.author == ctx.author or message.author == self.bot.user:
-                    messages.append(message.content)
+            for record in await recent_messages(self.bot, ctx.channel, 20, before=ctx.message.id):
+                if record.author_id in (ctx.author.id, self.bot.user.id):
+                    messages.append(record.content)
                 if len(messages) >= 10:
                     break
         else:
             # Fetch last 10 messages from the server channel
-            async for message in ctx.channel.history(limit=10):
-                if not message.author.bot:
-                    messages.append(f"{message.author.display_name}: {message.content}")
+            for record in await recent_messages(self.bot, ctx.channel, 10, before=ctx.message.id):
+                if not record.author_bot:
+                    messages.append(f"{record.author_name}: {record.content}")
 
         return messages if messages else None
 
-    async def generate_prompt(self, messages):
+    async def generate_prompt(self, messages, ctx):
         """Generate an AI image prompt based on message content."""
-        system_prompt = (
-            "Create a vivid, creative, and visually interesting image prompt "
-            "based on the following Discord messages. The prompt should describe an artistic scene "
-            "that represents the conversation topics and themes in a unique and engaging way."
-        )
-
-        final_prompt = "\n".join(messages)
-        async with self.lock:
-            try:
-                response = await self.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": final_prompt}
-                    ]
-                )
-                return response.choices[0].message.content.strip()
-            except Exception as e:
-                print(f"[Snapshot] OpenAI API error: {e}")
-                return None
-
-    async def generate_image(self, prompt):
+        try:
+            response = await get_gateway(self.bot).chat(
+                render_prompt("snapshot", messages_text="\n".join(messages)),
+                command="snapshot", stage="prompt", user_id=ctx.author.id, guild_id=getattr(ctx.guild, "id", None))
+            return response.strip()
+        except Exception as e:
+            print(f"[Snapshot] OpenAI API error: {e}")
+            return None
+
+    async def generate_image(self, prompt, ctx):
         """Generate an AI image based on the prompt using OpenAI's DALL·E API."""
-        async with self.lock:
-            try:
-                response = await self.openai_client.images.generate(
-                    prompt=prompt,
-                    n=1,
-                    size="1024x1024"
-                )
-                return response.data[0].url
-            except Exception as e:
-                print(f"[Snapshot] OpenAI Image API error: {e}")
-                return None
+        try:
+            return await get_gateway(self.bot).image(
+                prompt, size="1024x1024",
+                command="snapshot", user_id=ctx.author.id, guild_id=getattr(ctx.guild, "id", None)
+            )
+        except Exception as e:
+            print(f"[Snapshot] OpenAI Image API error: {e}")
+            return None
 
     @commands.command()
     async def snapshot(self, ctx):
@@ -79,15 +63,8 @@ class Snapshot(commands.Cog):
 
         is_dm = isinstance(ctx.channel, discord.DMChannel)
 
-        # Enforce role restriction only in server mode
-        if not is_dm:
-            role = discord.utils.get(ctx.author.roles, name="Vetted")
-            if not role:
-                await ctx.send("⚠️ You must have the 'Vetted' role to use this command.")
-                return
-
         # Acknowledge command execution with a "Please wait..." message
-        please_wait = await ctx.send("⏳ Generating an AI snapshot based on recent messages. Please wait...")
+        please_wait = await send_status(ctx, "⏳ Generating an AI snapshot based on recent messages. Please wait...")
 
         # Delete the command message in server mode
         if not is_dm:
@@ -104,14 +81,14 @@ class Snapshot(commands.Cog):
             return
 
         # Generate the image prompt
-        image_prompt = await self.generate_prompt(messages)
+        image_prompt = await self.generate_prompt(messages, ctx)
         if not image_prompt:
             await please_wait.delete()
             await ctx.send("⚠️ Failed to generate an image prompt.")
             return
 
         # Generate the image
-        image_url = await self.generate_image(image_prompt)
+        image_url = await self.generate_image(image_prompt, ctx)
         if not image_url:
             await please_wait.delete()
             await ctx.send("⚠️ Failed to generate an image.")
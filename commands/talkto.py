@@ -1,56 +1,46 @@
 import discord
 from discord.ext import commands
-import openai
-import os
-import re  # Regex for extracting words
-import asyncio
-from collections import Counter
+import re  # Regex for parsing mentions
+from commands.admission import send_status
+from commands.llm.context import pack, token_budget
+from commands.llm.prompts import render_prompt
+from commands.llm.style import StyleProfile
+from commands.message_store import author_messages
+from commands.openai_gateway import get_gateway
 
 class TalkSimulator(commands.Cog):
     """Cog for simulating how a user might respond based on past messages."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.lock = asyncio.Lock()  # Prevents multiple API calls at once
 
-    async def fetch_whitelisted_channels(self, ctx):
-        """Fetch allowed channels from bot configuration."""
+    def fetch_whitelisted_channels(self, ctx):
+        """Fetch allowed channels from the guild's bot configuration."""
         config_manager = self.bot.get_cog("ConfigManager")
         if not config_manager:
             return []
-        return await config_manager.get_command_whitelist("talkto")
+        return config_manager.get_whitelisted_channels(ctx.guild, "talkto")
+
+    async def fetch_user_messages(self, ctx, user: discord.Member, limit_per_channel=10, total_limit=500):
+        """Fetches messages from a user within whitelisted channels, newest first."""
+        author_index = self.bot.get_cog("AuthorIndex")
+        records = await author_index.messages(ctx.guild, user.id) if author_index else None
+        if records is not None:
+            return [record.content.strip() for record in reversed(records)][:total_limit]
 
-    async def fetch_user_messages(self, ctx, user: discord.Member, limit_per_channel=10, total_limit=500, max_chars=6000):
-        """Fetches messages from a user within whitelisted channels."""
         messages = []
-        total_chars = 0
-        whitelisted_channels = await self.fetch_whitelisted_channels(ctx)
+        whitelisted_channels = self.fetch_whitelisted_channels(ctx)
 
-        for channel in ctx.guild.text_channels:
-            if channel.name not in whitelisted_channels:
-                continue  # Skip non-whitelisted channels
+        for channel in whitelisted_channels:
             if not channel.permissions_for(ctx.guild.me).read_messages:
                 continue  # Skip unreadable channels
 
-            channel_message_count = 0
-
             try:
-                async for message in channel.history(limit=100, oldest_first=False):
-                    if message.author == user:
-                        msg_text = message.content.strip()
-                        if total_chars + len(msg_text) > max_chars:
-                            break  # Stop when character limit is reached
-
-                        messages.append(msg_text)
-                        total_chars += len(msg_text)
-                        channel_message_count += 1
-
-                    if len(messages) >= total_limit:
-                        return messages  # Stop if total limit reached
-
-                    if channel_message_count >= limit_per_channel:
-                        break  # Stop fetching from this channel
+                # Attachments and embeds carry no style to mimic, so only text messages are returned
+                records = await author_messages(self.bot, channel, user.id, limit_per_channel)
+                messages.extend(record.content.strip() for record in records)
+                if len(messages) >= total_limit:
+                    return messages[:total_limit]  # Stop if total limit reached
 
             except discord.Forbidden:
                 continue  # Skip channels with permission issues
@@ -59,6 +49,9 @@ class TalkSimulator(commands.Cog):
 
     async def resolve_member(self, ctx, identifier):
         """Resolves a user by mention, name, or ID."""
+        member_index = self.bot.get_cog("MemberIndex")
+        if member_index:
+            return await member_index.resolve(ctx.guild, identifier)
         match = re.match(r"<@!?(\d+)>", identifier)
         user_id = int(match.group(1)) if match else None
         if user_id:
@@ -84,14 +77,8 @@ class TalkSimulator(commands.Cog):
             await ctx.send("❌ The `!talkto` command can only be used in a server.")
             return
 
-        # Enforce role restrictions
-        role = discord.utils.get(ctx.author.roles, name="Vetted")
-        if not role:
-            await ctx.send("⚠️ You must have the 'Vetted' role to use this command.")
-            return
-
         # Acknowledge command execution
-        please_wait = await ctx.send(f"⏳ Processing... Simulating a response from `{user_mention}`. Please wait.")
+        please_wait = await send_status(ctx, f"⏳ Processing... Simulating a response from `{user_mention}`. Please wait.")
 
         user = await self.resolve_member(ctx, user_mention)
         if not user:
@@ -106,48 +93,35 @@ class TalkSimulator(commands.Cog):
             await ctx.send(f"⚠️ No messages found for {user.display_name}.")
             return
 
-        # Ensure message history does not exceed 5000 characters
-        conversation_history = "\n".join(f"- {msg}" for msg in past_messages)
-        if len(conversation_history) > 5000:
-            conversation_history = conversation_history[:4997] + "..."
-
-        # Generate relevant context from past messages
-        topics = {word for word in past_messages if len(word) > 4}
-        vocabulary = {word for word in past_messages}
+        # The profile is kept current as messages arrive; only the API fallback has to build one here
+        author_index = self.bot.get_cog("AuthorIndex")
+        profile = author_index.profile(ctx.guild.id, user.id) if author_index else None
+        if profile is None:
+            profile = StyleProfile.of(past_messages).describe()
 
-        relevant_prompt = f"Prioritize responding in a way related to these topics: {', '.join(topics)}."
-        vocabulary_hint = f"Try to use words from this set: {', '.join(vocabulary)}, but additional words are allowed."
-
-        # Construct AI prompt
-        prompt_text = f"""
-        The following are messages from {user.display_name}:
-        {conversation_history}
-
-        {relevant_prompt}
-        {vocabulary_hint}
-        You are allowed to use metaphors, but they must be relevant to the user’s way of speaking.
-
-        Do NOT use emojis in the response. Stick to text only.
+        # Fit the history to the token budget, trimming long messages rather than cutting mid-list
+        # (fetched newest first, so reverse to keep the newest when the budget runs out)
+        past_messages = pack(past_messages[::-1], token_budget(self.bot, "talkto", ctx.guild.id), max_item_tokens=150)
+        conversation_history = "\n".join(f"- {msg}" for msg in past_messages)
 
-        Now, generate a response in their style to this comment: "{prompt}"
-        """
+        # Fixed instructions come first in the template; the user's history goes after them
+        messages = render_prompt(
+            "talkto",
+            display_name=user.display_name,
+            conversation_history=conversation_history,
+            prompt=prompt,
+            **profile,
+        )
 
         # Fetch simulated response from OpenAI
-        async with self.lock:
-            try:
-                response = await self.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "Mimic the style of the provided user messages."},
-                        {"role": "user", "content": prompt_text}
-                    ]
-                )
-                simulated_response = response.choices[0].message.content.strip()
-            except Exception as e:
-                print(f"[TalkTo] OpenAI API error: {e}")
-                await please_wait.delete()
-                await ctx.send("⚠️ An error occurred while generating a response.")
-                return
+        try:
+            response = await get_gateway(self.bot).chat(messages, command="talkto", user_id=ctx.author.id, guild_id=ctx.guild.id)
+            simulated_response = response.strip()
+        except Exception as e:
+            print(f"[TalkTo] OpenAI API error: {e}")
+            await please_wait.delete()
+            await ctx.send("⚠️ An error occurred while generating a response.")
+            return
 
         # Delete "Please wait..." message
         await please_wait.delete()
@@ -0,0 +1,256 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import discord
+from discord.ext import commands, tasks
+from commands.admission import DEFAULT_COMMAND_LIMITS, send_status
+
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", "usage.db")
+
+# USD per million tokens (prompt, completion), and per generated image
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o": (2.50, 10.00),
+}
+FALLBACK_PRICE = MODEL_PRICES["gpt-4o"]  # Unknown models are costed conservatively
+IMAGE_PRICES = {"256x256": 0.016, "512x512": 0.018, "1024x1024": 0.020}
+
+# Spend limits in USD across all commands. Per-command, per-user limits come from
+# DEFAULT_COMMAND_BUDGETS or `user_hourly_budget_usd` / `user_daily_budget_usd`
+# in the command's #bot-config entry.
+DEFAULT_BUDGETS = {"user_hourly": 0.50, "user_daily": 2.00, "guild_daily": 20.00}
+DEFAULT_COMMAND_BUDGETS = {
+    "catchup": {"user_hourly": 0.15, "user_daily": 0.50},
+    "image": {"user_hourly": 0.10, "user_daily": 0.40},
+    "snapshot": {"user_hourly": 0.10, "user_daily": 0.40},
+}
+THROTTLE_AT = 0.8  # Fraction of a budget after which calls drop to the fast model tier
+WINDOWS = {"hourly": 3600, "daily": 86400}
+
+
+class BudgetExceeded(Exception):
+    """Raised before an LLM call when the user, guild or command is over its spend budget."""
+
+
+def estimate_cost(model, prompt_tokens=0, completion_tokens=0, images=0, size=None):
+    """Returns the USD cost of one call."""
+    if images:
+        return images * IMAGE_PRICES.get(size, IMAGE_PRICES["1024x1024"])
+    prompt_price, completion_price = MODEL_PRICES.get(model, FALLBACK_PRICE)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class UsageLedger(commands.Cog):
+    """Records the tokens, images, latency and cost of every LLM call and enforces spend budgets.
+
+    Calls are tallied in memory (so budget checks never touch the disk) and
+    written to a local SQLite file in batches by a background task.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = None
+        self.db_lock = threading.Lock()  # Writes and reports run in worker threads
+        self.pending = []  # Rows not yet written to disk
+        self.spend = Counter()  # (scope, key, window, window index) -> USD
+
+    async def cog_load(self):
+        """Opens the usage store and restores today's spend so budgets survive restarts."""
+        await asyncio.to_thread(self.open_db)
+        self.flush_usage.start()
+
+    async def cog_unload(self):
+        self.flush_usage.cancel()
+        await asyncio.to_thread(self.write_pending)
+        if self.db:
+            self.db.close()
+
+    def open_db(self):
+        self.db = sqlite3.connect(USAGE_DB_PATH, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS llm_usage (
+                ts REAL NOT NULL,
+                command TEXT,
+                user_id INTEGER,
+                guild_id INTEGER,
+                model TEXT,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                images INTEGER NOT NULL DEFAULT 0,
+                latency REAL,
+                cost REAL NOT NULL DEFAULT 0,
+                prompt TEXT
+            )"""
+        )
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(llm_usage)")}
+        if "prompt" not in columns:  # Stores created before prompt templates were recorded
+            self.db.execute("ALTER TABLE llm_usage ADD COLUMN prompt TEXT")
+        self.db.execute("CREATE INDEX IF NOT EXISTS llm_usage_ts ON llm_usage (ts)")
+        self.db.commit()
+
+        today = time.time() // WINDOWS["daily"] * WINDOWS["daily"]
+        rows = self.db.execute(
+            "SELECT ts, command, user_id, guild_id, cost FROM llm_usage WHERE ts >= ?", (today,)
+        ).fetchall()
+        for ts, command, user_id, guild_id, cost in rows:
+            self.tally(ts, command, user_id, guild_id, cost)
+        print(f"[UsageLedger] Restored {len(rows)} calls from today.")
+
+    def tally(self, ts, command, user_id, guild_id, cost):
+        for scope, key in self.scopes(command, user_id, guild_id):
+            for window, length in WINDOWS.items():
+                self.spend[(scope, key, window, int(ts // length))] += cost
+
+    @staticmethod
+    def scopes(command, user_id, guild_id):
+        scopes = []
+        if user_id is not None:
+            scopes += [("user", user_id), ("user_command", (user_id, command))]
+        if guild_id is not None:
+            scopes.append(("guild", guild_id))
+        return scopes
+
+    def record(self, command, user_id, guild_id, model, prompt_tokens=0, completion_tokens=0,
+               images=0, size=None, latency=None, prompt=None):
+        """Books one completed LLM call and returns its cost. `prompt` is the template ID (name@vN), if any."""
+        now = time.time()
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, images, size)
+        self.tally(now, command, user_id, guild_id, cost)
+        self.pending.append((now, command, user_id, guild_id, model, prompt_tokens, completion_tokens, images, latency, cost, prompt))
+        return cost
+
+    def get_budgets(self, command, guild_id=None):
+        """Returns {(scope, window): limit} for a command, preferring the guild's #bot-config."""
+        budgets = {
+            ("user", "hourly"): DEFAULT_BUDGETS["user_hourly"],
+            ("user", "daily"): DEFAULT_BUDGETS["user_daily"],
+            ("guild", "daily"): DEFAULT_BUDGETS["guild_daily"],
+        }
+        command_budgets = DEFAULT_COMMAND_BUDGETS.get(command, {})
+        config_manager = self.bot.get_cog("ConfigManager")
+        for window in ("hourly", "daily"):
+            limit = command_budgets.get(f"user_{window}")
+            if config_manager:
+                configured = config_manager.get_command_setting(command, f"user_{window}_budget_usd", guild_id=guild_id)
+                if isinstance(configured, (int, float)) and configured >= 0:
+                    limit = configured
+            if limit is not None:
+                budgets[("user_command", window)] = limit
+        return budgets
+
+    def check(self, command, user_id, guild_id=None):
+        """Raises BudgetExceeded if a budget is used up; returns True once one is nearly used up."""
+        now = time.time()
+        keys = dict(self.scopes(command, user_id, guild_id))
+        throttle = False
+        for (scope, window), limit in self.get_budgets(command, guild_id).items():
+            if scope not in keys:
+                continue
+            length = WINDOWS[window]
+            spent = self.spend[(scope, keys[scope], window, int(now // length))]
+            if spent >= limit:
+                minutes = max(1, int((length - now % length) // 60))
+                raise BudgetExceeded(self.describe(scope, window, command, minutes))
+            throttle = throttle or spent >= limit * THROTTLE_AT
+        return throttle
+
+    @staticmethod
+    def describe(scope, window, command, minutes):
+        if scope == "guild":
+            who = f"This server has used its {window} AI budget"
+        elif scope == "user_command":
+            who = f"You've used your {window} budget for `!{command}`"
+        else:
+            who = f"You've used your {window} AI budget"
+        return f"{who}. Please try again in about {minutes} minutes."
+
+    async def invoke(self, ctx, invoke):
+        """Turns an LLM command away up front if its caller is already over budget."""
+        if ctx.command.qualified_name not in DEFAULT_COMMAND_LIMITS:
+            await invoke(ctx)  # Only the heavy commands spend money
+            return
+        try:
+            self.check(ctx.command.qualified_name, ctx.author.id, getattr(ctx.guild, "id", None))
+        except BudgetExceeded as e:
+            await send_status(ctx, f"🚦 {e}")
+            return
+        await invoke(ctx)
+
+    @tasks.loop(seconds=30)
+    async def flush_usage(self):
+        """Writes buffered usage to disk and forgets windows that have closed."""
+        await asyncio.to_thread(self.write_pending)
+        now = time.time()
+        current = {window: int(now // length) for window, length in WINDOWS.items()}
+        for key in [k for k in self.spend if k[3] < current[k[2]]]:
+            del self.spend[key]
+
+    def write_pending(self):
+        rows, self.pending = self.pending, []
+        if rows and self.db:
+            with self.db_lock, self.db:
+                self.db.executemany(
+                    "INSERT INTO llm_usage (ts, command, user_id, guild_id, model, prompt_tokens, completion_tokens, "
+                    "images, latency, cost, prompt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def summarize(self, since):
+        """Returns per-command, per-user and per-guild totals since `since` (epoch seconds)."""
+        self.write_pending()
+        summary = {}
+        with self.db_lock:
+            for column in ("command", "user_id", "guild_id"):
+                summary[column] = self.db.execute(
+                    f"SELECT {column}, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(images), "
+                    f"AVG(latency), SUM(cost) FROM llm_usage WHERE ts >= ? GROUP BY {column} "
+                    f"ORDER BY SUM(cost) DESC LIMIT 5",
+                    (since,),
+                ).fetchall()
+        return summary
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def usage(self, ctx):
+        """Shows today's OpenAI usage and cost by command, user and server.
+
+        Usage:
+        `!usage` → DMs the top commands, users and servers by spend since midnight UTC.
+
+        - **Server Mode Only**: Requires administrator permissions.
+        """
+        today = time.time() // WINDOWS["daily"] * WINDOWS["daily"]
+        summary = await asyncio.to_thread(self.summarize, today)
+
+        lines = ["💰 **OpenAI usage today (UTC)**"]
+        for column, title in (("command", "Commands"), ("user_id", "Users"), ("guild_id", "Servers")):
+            lines.append(f"\n**{title}**")
+            for key, calls, prompt, completion, images, latency, cost in summary[column]:
+                if column == "user_id" and key is not None:
+                    user = self.bot.get_user(key)
+                    key = user.name if user else key
+                elif column == "guild_id" and key is not None:
+                    guild = self.bot.get_guild(key)
+                    key = guild.name if guild else key
+                lines.append(
+                    f"• `{key}` — ${cost:.3f} · {calls} calls · {prompt or 0}+{completion or 0} tokens · "
+                    f"{images or 0} images · avg {latency or 0:.1f}s"
+                )
+
+        try:
+            await ctx.author.send("\n".join(lines))
+        except discord.Forbidden:
+            await ctx.send("⚠️ I couldn't send you a DM. Please check your privacy settings.")
+
+
+async def setup(bot):
+    await bot.add_cog(UsageLedger(bot))
+    command = bot.get_command("usage")
+    if command:
+        command.command_mode = "server"
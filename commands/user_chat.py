@@ -1,16 +1,20 @@
+import asyncio
 import discord
 from discord.ext import commands, tasks
-import openai
-import os
 import logging
 import time  # Used for session timeout
+from commands.admission import AdmissionRejected
+from commands.deadlines import CommandDeadlines
+from commands.llm.context import pack_chat, token_budget
+from commands.llm.streaming import stream_reply
+from commands.openai_gateway import get_gateway
+from commands.usage import BudgetExceeded
 
 class UserChat(commands.Cog):
     """Handles direct DM conversations with the bot when no command is used, with short-term memory."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.session_memory = {}  # Stores temporary conversation context
         self.memory_timeout = 28800  # 8 hours (in seconds)
         self.cleanup_sessions.start()  # Starts session cleanup task
@@ -19,37 +23,19 @@ class UserChat(commands.Cog):
         """Ensures cleanup task is stopped when cog is unloaded."""
         self.cleanup_sessions.cancel()
 
-    async def get_member_in_guild(self, user: discord.User):
-        """Retrieves the member object for a user in a mutual guild, if available."""
-        for guild in self.bot.guilds:
-            try:
-                member = guild.get_member(user.id) or await guild.fetch_member(user.id)
-                if member:
-                    return member
-            except (discord.NotFound, discord.Forbidden):
-                continue  # Skip if member isn't in the guild or bot lacks permission
-            except Exception as e:
-                logging.exception(f"Error fetching member {user.id} in {guild.name}: {e}")
-                continue
-        return None  # No mutual guilds found
-
-    def has_vetted_role(self, member: discord.Member):
-        """Checks if the user has the 'Vetted' role in the guild."""
-        return any(role.name == "Vetted" for role in member.roles)
-
     async def process_dm_message(self, message: discord.Message):
         """Processes a DM message that does not start with a command."""
         if message.author.bot:
             return  # Ignore bot messages
 
-        # Verify user is in a mutual guild
-        member = await self.get_member_in_guild(message.author)
-        if not member:
+        # Verify user is in a mutual guild and has the 'Vetted' role there (cached by authorization.py)
+        authorization = self.bot.get_cog("Authorization")
+        access = await authorization.dm_access_for(message.author) if authorization else None
+        if access is None:
             await message.channel.send("⚠️ I can only chat with users who share a server with me.")
             return
 
-        # Verify user has the 'Vetted' role
-        if not self.has_vetted_role(member):
+        if not access:
             await message.channel.send("⚠️ You must have the 'Vetted' role in a mutual server to chat with me.")
             return
 
@@ -74,21 +60,21 @@ class UserChat(commands.Cog):
         session["messages"].append({"role": "user", "content": message.content})
         session["last_active"] = time.time()  # Update last activity time
 
-        # Keep only the last few messages (limit to prevent overflow)
-        session["messages"] = session["messages"][-10:]
+        # Keep as much recent conversation as fits the token budget
+        session["messages"] = pack_chat(session["messages"], token_budget(self.bot, "user_chat"), max_item_tokens=1000)
 
         # Generate AI response using conversation history
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=session["messages"]
+            reply = await stream_reply(
+                message.channel,
+                get_gateway(self.bot).chat_stream(list(session["messages"]), command="user_chat", user_id=user_id)
             )
-            reply = response.choices[0].message.content
-            await message.channel.send(reply)
 
             # Append bot response to memory
             session["messages"].append({"role": "assistant", "content": reply})
 
+        except BudgetExceeded as e:
+            await message.channel.send(f"🚦 {e}")
         except Exception as e:
             logging.exception(f"UserChat Error: {e}")
             await message.channel.send("⚠️ Sorry, something went wrong while processing your message.")
@@ -105,7 +91,27 @@ class UserChat(commands.Cog):
     async def on_message(self, message: discord.Message):
         """Intercepts non-command DM messages."""
         if isinstance(message.channel, discord.DMChannel) and not message.content.startswith("!"):
+            # DM chat isn't a command, so apply its deadline here
+            deadlines = self.bot.get_cog("CommandDeadlines")
+            deadline = deadlines.get_deadline("user_chat") if deadlines else None
+            try:
+                await asyncio.wait_for(self.admit_dm_message(message), timeout=deadline)
+            except asyncio.TimeoutError:
+                await CommandDeadlines.notify_timeout(message.author, message.channel, "chat", deadline)
+
+    async def admit_dm_message(self, message: discord.Message):
+        """Runs a DM through admission control before processing it."""
+        if message.author.bot:
+            return  # The bot's own replies also arrive here
+        admission = self.bot.get_cog("AdmissionControl")
+        if not admission:
             await self.process_dm_message(message)
+            return
+        try:
+            async with admission.admit("user_chat", message.author.id):
+                await self.process_dm_message(message)
+        except AdmissionRejected as e:
+            await message.channel.send(f"🚦 {e}")
 
 async def setup(bot):
     await bot.add_cog(UserChat(bot))
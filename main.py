@@ -1,6 +1,6 @@
 import asyncio
 import discord
-import openai
+import functools
 import os
 from discord.ext import commands
 from dotenv import load_dotenv
@@ -10,9 +10,6 @@ import logging  # Added logging to replace config.logger
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client with the latest API format
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("discord")
@@ -20,7 +17,29 @@ logger = logging.getLogger("discord")
 # Discord bot setup
 intents = discord.Intents.default()
 intents.message_content = True  # Allows access to message content
-bot = commands.Bot(command_prefix="!", intents=intents)
+class AskMeBot(commands.Bot):
+    async def invoke(self, ctx):
+        """Runs every command through authorization, admission control, spend budgets and its deadline.
+
+        See commands/authorization.py, commands/admission.py, commands/usage.py
+        and commands/deadlines.py. Wrappers are listed innermost first, so
+        unauthorized and over-budget commands are turned away before queueing
+        and the deadline also covers time spent in a queue. Role checks live
+        only in the Authorization cog, so if it failed to load no command runs.
+        """
+        invoke = super().invoke
+        if ctx.command is not None:
+            if self.get_cog("Authorization") is None:
+                logger.error(f"Refused !{ctx.command} from {ctx.author}: the Authorization cog is not loaded.")
+                await ctx.send("⚠️ Commands are unavailable because permissions can't be checked right now. Please tell an administrator.")
+                return
+            for cog_name in ("AdmissionControl", "UsageLedger", "CommandDeadlines", "Authorization"):
+                cog = self.get_cog(cog_name)
+                if cog is not None:
+                    invoke = functools.partial(cog.invoke, invoke=invoke)
+        await invoke(ctx)
+
+bot = AskMeBot(command_prefix="!", intents=intents)
 
 # Log when bot is ready
 @bot.event